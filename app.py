@@ -1,13 +1,23 @@
 # app.py  –  servidor Flask principal (VERSÃO FINAL CORRIGIDA)
 # =============================================================
+import io
 import os
+import sys
+import json
+import time
+import threading
 import traceback
-from flask import (Flask, request, jsonify, render_template,
-                   send_from_directory)
+from flask import (Flask, Response, g, request, jsonify, render_template,
+                   send_file, send_from_directory, stream_with_context, url_for)
 from flask_cors import CORS
+from werkzeug.wsgi import ClosingIterator
 
-from astrologia import gerar_mapa_astral  # sua função de cálculo
-from pdf import criar_pdf  # gera o PDF final
+from astrologia import gerar_mapa_astral, LOG_DETALHADO  # sua função de cálculo
+import tarefas  # fila assíncrona (POST /api/mapa?async=1)
+import lote     # geração em lote (POST /api/mapas/batch)
+import metricas # Server-Timing e /metrics
+import resultados  # dados do mapa em JSON/MessagePack (POST /api/mapa/dados)
+import cache_mapas
 
 # ─────────────  Configuração básica  ──────────────
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -20,11 +30,141 @@ TEMPL_DIR = os.path.join(BASE_DIR, "templates")
 # O Flask precisa do caminho absoluto para `send_from_directory`
 PDF_DIR_ABSOLUTE = os.path.abspath(PDF_DIR)
 
+# "memoria" (padrão): o PDF vai do buffer direto para a resposta.
+# "disco": grava em pdfs/ (com retenção por idade/tamanho) e serve de lá.
+PDF_MODO = os.environ.get("PDF_MODO", "memoria")
+
 # --- E A CORREÇÃO É USADA AQUI ---
 # Na inicialização do Flask, apontamos para a pasta de templates correta.
 app = Flask(__name__, template_folder=TEMPL_DIR, static_folder="static")
 CORS(app)  # permite chamadas JS locais sem CORS errors
 
+# Estatísticas de cache e fila também saem no /metrics
+metricas.registrar_estatisticas("cache_mapas", cache_mapas.estatisticas,
+                                contadores=("hits_memoria", "hits_disco", "misses", "gravacoes",
+                                            "despejos_memoria", "despejos_disco"))
+metricas.registrar_estatisticas("interpretacoes", lambda: _estatisticas_interpretacoes(),
+                                contadores=("hits", "misses"))
+metricas.registrar_estatisticas("tarefas", lambda: {"pendentes": tarefas.pendentes()})
+metricas.registrar_estatisticas("resultados", resultados.estatisticas)
+
+
+# ─────────────  Métricas por requisição  ──────────────
+@app.before_request
+def iniciar_metricas():
+    g.inicio = time.perf_counter()
+    metricas.iniciar()
+
+
+@app.after_request
+def registrar_metricas(resp):
+    """Server-Timing com as etapas da requisição; histograma e contador por rota."""
+    total = time.perf_counter() - g.inicio
+    rota = request.url_rule.rule if request.url_rule else "desconhecida"
+    resp.headers["Server-Timing"] = metricas.server_timing([("total", total)])
+    metricas.REQUISICOES.observar(rota, total)
+    metricas.RESPOSTAS.incrementar(rota, str(resp.status_code))
+    request.environ["metricas.fim_view"] = time.perf_counter()
+    return resp
+
+
+def medir_envio(wsgi_app):
+    """
+    Envio do corpo: só termina depois dos cabeçalhos, então vai só para o
+    histograma (etapa "envio"), medido até o servidor fechar a resposta.
+    Com vários workers, é também quando o instantâneo do /metrics é gravado.
+    """
+    def app_medido(environ, start_response):
+        def registrar_envio():
+            fim_view = environ.get("metricas.fim_view")
+            if fim_view is not None:
+                metricas.registrar("envio", time.perf_counter() - fim_view)
+            metricas.persistir()
+        return ClosingIterator(wsgi_app(environ, start_response), registrar_envio)
+    return app_medido
+
+app.wsgi_app = medir_envio(app.wsgi_app)
+
+
+# ─────────────  Helpers  ──────────────
+# O ReportLab (pdf.py, interpretacoes.py) só é importado quando um PDF é
+# gerado – ou no aquecimento, em produção. Quem só serve o formulário e
+# os arquivos estáticos não paga esse custo.
+PRONTO = threading.Event()
+
+
+def aquecer():
+    """
+    Gera um mapa e um PDF de exemplo: importa flatlib/ReportLab, abre os
+    .se1, carrega fontes, estilos e imagens. Com o preload do gunicorn roda
+    uma vez no processo pai e os workers herdam tudo (copy-on-write).
+    """
+    import pdf
+    t0 = time.perf_counter()
+    mapa = gerar_mapa_astral("Aquecimento", "01/01/2000", "12:00", "São Paulo", "SP")
+    if mapa is None:
+        raise RuntimeError("aquecimento: falha ao gerar o mapa de exemplo")
+    pdf.criar_pdf_bytes(mapa)
+    pdf.aquecer_imagens()
+    metricas.zerar()
+    PRONTO.set()
+    print(f"[INFO] aquecimento concluído em {time.perf_counter() - t0:.2f}s")
+
+
+def resultado_por_id(ident: str):
+    """
+    Mapa de um resultado de /api/mapa/dados, visto por qualquer worker
+    (resultados.py). Se já foi despejado, um POST com o mesmo corpo do
+    pedido original recalcula (pelo cache de mapas).
+    """
+    mapa = resultados.obter(ident)
+    if mapa is None and request.method == "POST":
+        args = resultados.normalizar_entrada(request.get_json(force=True, silent=True))
+        if args is not None and resultados.identificador(args) == ident:
+            mapa = gerar_mapa_astral(*args)
+            if mapa is not None:
+                resultados.guardar(ident, mapa)
+    return mapa
+
+
+def _estatisticas_interpretacoes():
+    modulo = sys.modules.get("interpretacoes")
+    return modulo.estatisticas() if modulo else {}
+
+
+def resposta_pdf(dados: bytes, filename: str):
+    """Resposta de download a partir dos bytes do PDF (Content-Length exato)."""
+    resp = send_file(io.BytesIO(dados), mimetype="application/pdf",
+                     as_attachment=True, download_name=filename)
+    resp.content_length = len(dados)
+    return resp
+
+
+def status_tarefa(tarefa: dict) -> dict:
+    """Status público da tarefa, com os links que o cliente precisa."""
+    corpo = tarefas.status(tarefa)
+    corpo["status_url"] = url_for("api_tarefa", tid=tarefa["id"])
+    corpo["eventos_url"] = url_for("api_tarefa_eventos", tid=tarefa["id"])
+    if tarefa["status"] == "concluida":
+        corpo["pdf_url"] = url_for("api_tarefa_pdf", tid=tarefa["id"])
+    return corpo
+
+
+def enfileirar_mapa(args, com_transitos=False):
+    """Modo assíncrono: 202 com o id da tarefa, ou 429 se a fila estiver cheia."""
+    try:
+        tid = tarefas.enviar(*args, com_transitos=com_transitos)
+    except tarefas.FilaCheia:
+        resp = jsonify({
+            "sucesso": False,
+            "erro": "Fila cheia, tente novamente em instantes"
+        })
+        resp.status_code = 429
+        resp.headers["Retry-After"] = "5"
+        return resp
+    corpo = dict(status_tarefa(tarefas.obter(tid)), sucesso=True)
+    return jsonify(corpo), 202, {"Location": corpo["status_url"]}
+
 
 # ─────────────  Rotas  ──────────────
 @app.route("/", methods=["GET"])
@@ -41,7 +181,6 @@ def api_mapa():
     """
     try:
         data = request.get_json(force=True, silent=False)
-        print("[DEBUG] Requisição recebida:", data)
 
         campos = ["nome", "data", "hora", "cidade", "estado"]
         if not all(k in data and data[k].strip() for k in campos):
@@ -50,37 +189,229 @@ def api_mapa():
                 "erro": "Campos obrigatórios ausentes"
             }), 400
 
-        mapa = gerar_mapa_astral(data["nome"].strip(), data["data"].strip(),
-                                 data["hora"].strip(), data["cidade"].strip(),
-                                 data["estado"].strip())
+        args = [data[k].strip() for k in campos]
+        com_transitos = request.args.get("transitos") == "1"
+        if request.args.get("async") == "1":
+            return enfileirar_mapa(args, com_transitos)
+
+        mapa = gerar_mapa_astral(*args)
         if mapa is None:
             return jsonify({
                 "sucesso": False,
                 "erro": "Falha ao gerar dados do mapa"
             }), 500
 
-        pdf_relpath = criar_pdf(mapa)
-        pdf_filename = os.path.basename(pdf_relpath)
+        from pdf import criar_pdf, criar_pdf_bytes, nome_arquivo_pdf
+        eventos = None
+        if com_transitos:
+            import transitos
+            eventos = transitos.proximos_12_meses(mapa)
+
+        if PDF_MODO == "disco":
+            pdf_relpath = criar_pdf(mapa, eventos)
+            pdf_filename = os.path.basename(pdf_relpath)
 
-        return send_from_directory(PDF_DIR_ABSOLUTE,
-                                   pdf_filename,
-                                   as_attachment=True)
+            return send_from_directory(PDF_DIR_ABSOLUTE,
+                                       pdf_filename,
+                                       as_attachment=True)
+
+        dados = criar_pdf_bytes(mapa, eventos)
+        with metricas.etapa("resposta"):
+            return resposta_pdf(dados, nome_arquivo_pdf(mapa))
 
     except Exception as exc:
-        print("[ERRO /api/mapa]", exc)
-        traceback.print_exc()
+        # Sem a mensagem: pode conter os dados de nascimento
+        metricas.ERROS.incrementar("api_mapa")
+        print("[ERRO /api/mapa]", exc.__class__.__name__)
+        if LOG_DETALHADO:
+            traceback.print_exc()
         return jsonify({
             "sucesso": False,
             "erro": "Erro interno do servidor"
         }), 500
 
 
+@app.route("/api/mapa/dados", methods=["POST"])
+def api_mapa_dados():
+    """
+    Calcula os dados do mapa (objetos e aspectos, sem PDF) e responde 303
+    com o Location do resultado (GET /api/mapa/dados/<id>). Campos só no
+    corpo JSON: o id é um hash, então dados de nascimento não vão para
+    URLs nem logs. O ?formato= segue para o Location.
+    """
+    args = resultados.normalizar_entrada(request.get_json(force=True, silent=True))
+    if args is None:
+        return jsonify({
+            "sucesso": False,
+            "erro": "Campos obrigatórios ausentes"
+        }), 400
+
+    ident = resultados.identificador(args)
+    if resultados.obter(ident) is None:
+        mapa = gerar_mapa_astral(*args)
+        if mapa is None:
+            return jsonify({
+                "sucesso": False,
+                "erro": "Falha ao gerar dados do mapa"
+            }), 500
+        resultados.guardar(ident, mapa)
+
+    local = url_for("api_mapa_dados_resultado", ident=ident, formato=request.args.get("formato"))
+    return jsonify({"sucesso": True, "id": ident, "url": local}), 303, {"Location": local}
+
+
+@app.route("/api/mapa/dados/<ident>", methods=["GET"])
+def api_mapa_dados_resultado(ident):
+    """
+    Um resultado de POST /api/mapa/dados: JSON por padrão ou MessagePack
+    (?formato=msgpack ou Accept: application/msgpack). O ETag é forte e
+    sai do id: If-None-Match igual recebe 304 sem nenhuma consulta.
+    """
+    formato = resultados.escolher_formato(request.args.get("formato"), request.accept_mimetypes)
+    if formato is None:
+        return jsonify({"sucesso": False, "erro": "Formato indisponível"}), 406
+
+    tag = resultados.etag(ident, formato)
+    cabecalhos = {"ETag": f'"{tag}"', "Vary": "Accept", "Cache-Control": "no-cache"}
+    if request.if_none_match.contains_weak(tag):
+        return Response(status=304, headers=cabecalhos)
+
+    mapa = resultados.obter(ident)
+    if mapa is None:
+        return jsonify({"sucesso": False, "erro": "Resultado não encontrado"}), 404
+
+    corpo = {"sucesso": True, "id": ident,
+             "pdf_url": url_for("api_mapa_dados_pdf", ident=ident),
+             "roda_url": url_for("api_mapa_dados_roda", ident=ident), "mapa": mapa}
+    return Response(resultados.serializar(corpo, formato),
+                    mimetype=resultados.FORMATOS[formato], headers=cabecalhos)
+
+
+@app.route("/api/mapa/dados/<ident>/pdf", methods=["GET", "POST"])
+def api_mapa_dados_pdf(ident):
+    """PDF de um resultado de /api/mapa/dados (ver resultado_por_id)."""
+    mapa = resultado_por_id(ident)
+    if mapa is None:
+        return jsonify({"sucesso": False, "erro": "Resultado não encontrado"}), 404
+
+    from pdf import criar_pdf_bytes, nome_arquivo_pdf
+    dados = criar_pdf_bytes(mapa)
+    with metricas.etapa("resposta"):
+        return resposta_pdf(dados, nome_arquivo_pdf(mapa))
+
+
+@app.route("/api/mapa/dados/<ident>/roda.svg", methods=["GET", "POST"])
+def api_mapa_dados_roda(ident):
+    """Roda do mapa de um resultado de /api/mapa/dados, em SVG."""
+    import roda
+    tag = resultados.etag(ident, "roda-svg")
+    cabecalhos = {"ETag": f'"{tag}"', "Cache-Control": "no-cache"}
+    if request.method == "GET" and request.if_none_match.contains_weak(tag):
+        return Response(status=304, headers=cabecalhos)   # 304 só vale para GET/HEAD
+    mapa = resultado_por_id(ident)
+    if mapa is None:
+        return jsonify({"sucesso": False, "erro": "Resultado não encontrado"}), 404
+
+    with metricas.etapa("roda"):
+        dados = roda.svg(mapa)
+    return Response(dados, mimetype="image/svg+xml", headers=cabecalhos)
+
+
+@app.route("/api/mapas/batch", methods=["POST"])
+def api_mapas_batch():
+    """
+    Lote em NDJSON: um nascimento por linha na entrada, um resultado por
+    linha na saída, em streaming. Com ?pdf=zip devolve um zip com os PDFs
+    e o resultados.ndjson.
+    """
+    entradas = iter(request.stream.readline, b"")
+    if request.args.get("pdf") == "zip":
+        return Response(stream_with_context(lote.zip_stream(entradas)),
+                        mimetype="application/zip",
+                        headers={"Content-Disposition": "attachment; filename=mapas.zip"})
+    return Response(stream_with_context(lote.ndjson_stream(entradas)),
+                    mimetype="application/x-ndjson")
+
+
+@app.route("/api/tarefas", methods=["GET"])
+def api_tarefas():
+    """Profundidade da fila e latência por etapa do modo assíncrono."""
+    return jsonify(tarefas.estatisticas())
+
+
+@app.route("/api/tarefas/<tid>", methods=["GET"])
+def api_tarefa(tid):
+    """Status de uma tarefa assíncrona (para polling)."""
+    tarefa = tarefas.obter(tid)
+    if tarefa is None:
+        return jsonify({"sucesso": False, "erro": "Tarefa não encontrada"}), 404
+    return jsonify(status_tarefa(tarefa))
+
+
+@app.route("/api/tarefas/<tid>/pdf", methods=["GET"])
+def api_tarefa_pdf(tid):
+    """Baixa o PDF de uma tarefa concluída."""
+    tarefa = tarefas.obter(tid)
+    if tarefa is None:
+        return jsonify({"sucesso": False, "erro": "Tarefa não encontrada"}), 404
+    if tarefa["status"] == "pendente":
+        return jsonify(status_tarefa(tarefa)), 202
+    if tarefa["status"] == "erro":
+        return jsonify(dict(status_tarefa(tarefa), sucesso=False)), 500
+    dados = tarefas.pdf(tid)
+    if dados is None:   # expirou entre as duas consultas
+        return jsonify({"sucesso": False, "erro": "Tarefa não encontrada"}), 404
+    return resposta_pdf(dados, tarefa["filename"])
+
+
+@app.route("/api/tarefas/<tid>/eventos", methods=["GET"])
+def api_tarefa_eventos(tid):
+    """Server-sent events: um evento `status` por mudança, até a tarefa terminar."""
+    tarefa = tarefas.obter(tid)
+    if tarefa is None:
+        return jsonify({"sucesso": False, "erro": "Tarefa não encontrada"}), 404
+
+    def eventos():
+        yield f"event: status\ndata: {json.dumps(status_tarefa(tarefa))}\n\n"
+        final = tarefas.aguardar(tid, timeout=15)
+        while final is False:
+            yield ": aguardando\n\n"   # keep-alive para proxies
+            final = tarefas.aguardar(tid, timeout=15)
+        if final is not None:
+            yield f"event: status\ndata: {json.dumps(status_tarefa(final))}\n\n"
+
+    return Response(stream_with_context(eventos()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.route("/api/pronto", methods=["GET"])
+def api_pronto():
+    """Readiness: 200 depois do aquecimento, 503 antes."""
+    if PRONTO.is_set():
+        return jsonify({"pronto": True})
+    return jsonify({"pronto": False}), 503
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Métricas no formato de texto do Prometheus (somadas entre os workers)."""
+    return Response(metricas.texto_prometheus(),
+                    mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+
 @app.route("/pdfs/<path:filename>")
 def baixar_pdf(filename):
     """Serve arquivos PDF gerados em /pdfs."""
+    from pdf import limpar_pdfs
+    limpar_pdfs()
     return send_from_directory(PDF_DIR_ABSOLUTE, filename)
 
 
 # ─────────────  Execução direta  ──────────────
+# Servidor de desenvolvimento. Em produção: gunicorn -c gunicorn.conf.py app:app
 if __name__ == '__main__':
+    if os.environ.get("AQUECER", "1") == "1":
+        aquecer()
+    else:
+        PRONTO.set()
     app.run(host='0.0.0.0', port=5000)
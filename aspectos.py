@@ -0,0 +1,64 @@
+# aspectos.py – motor vetorizado de aspectos (NumPy)
+# =============================================================
+# Calcula de uma vez a matriz de separações entre todos os pares de
+# pontos e confronta com a lista de ângulos, reproduzindo exatamente a
+# regra de flatlib.aspects.getAspect + o filtro de orbe de astrologia.py:
+#
+#   • o ponto "ativo" é o de maior |velocidade| (não-planetas valem -1;
+#     empate → o segundo ponto do par);
+#   • separação = znorm(lon_passivo - lon_ativo), orbe = ||sep| - ângulo|;
+#   • vale o primeiro ângulo da lista cujo orbe cabe no orbe de um dos
+#     dois pontos; nodos/partes como ativos só fazem conjunção;
+#   • por fim o orbe precisa ser <= ao maior orbe_max do par (5 para
+#     Sol/Lua, 3 para os demais).
+#
+# Aceita um mapa (n_pontos,) ou um lote empilhado (n_mapas × n_pontos).
+from functools import lru_cache
+import numpy as np
+
+
+@lru_cache(maxsize=8)
+def pares(n: int):
+    """Índices (i, j) com i < j, na mesma ordem do laço duplo original."""
+    i, j = np.triu_indices(n, 1)
+    i.setflags(write=False); j.setflags(write=False)
+    return i, j
+
+def detectar_aspectos(lons, vels, orbes, planeta, so_conjuncao, orbe_max, angulos):
+    """
+    lons, vels  : (..., n) longitudes e velocidades em longitude
+    orbes       : (n,) orbe de cada ponto (flatlib: -1 para ângulos)
+    planeta     : (n,) bool – pontos com velocidade própria
+    so_conjuncao: (n,) bool – pontos que, como ativos, só fazem conjunção
+    orbe_max    : (n,) orbe máximo aceito no relatório
+    angulos     : (a,) ângulos dos aspectos, em ordem de prioridade
+
+    Devolve (tem, idx_angulo, orbe), cada um com forma (..., n_pares).
+    """
+    lons = np.asarray(lons, dtype=np.float64)
+    vels = np.asarray(vels, dtype=np.float64)
+    orbes = np.asarray(orbes, dtype=np.float64)
+    so_conjuncao = np.asarray(so_conjuncao, dtype=bool)
+    orbe_max = np.asarray(orbe_max, dtype=np.float64)
+    angulos = np.asarray(angulos, dtype=np.float64)
+    i, j = pares(lons.shape[-1])
+
+    vel = np.where(planeta, np.abs(vels), -1.0)
+    ativo_i = vel[..., i] > vel[..., j]
+    lon_a = np.where(ativo_i, lons[..., i], lons[..., j])
+    lon_p = np.where(ativo_i, lons[..., j], lons[..., i])
+
+    sep = np.remainder(lon_p - lon_a, 360.0)
+    sep = np.where(sep <= 180, sep, sep - 360)
+    orb = np.abs(np.abs(sep)[..., None] - angulos)          # (..., pares, a)
+
+    orb_a = np.where(ativo_i, orbes[i], orbes[j])[..., None]
+    orb_p = np.where(ativo_i, orbes[j], orbes[i])[..., None]
+    valido = (orb <= orb_a) | (orb <= orb_p)
+    conj_a = np.where(ativo_i, so_conjuncao[i], so_conjuncao[j])[..., None]
+    valido &= ~(conj_a & (angulos != 0))
+
+    idx = valido.argmax(axis=-1)
+    orbe = np.take_along_axis(orb, idx[..., None], axis=-1)[..., 0]
+    tem = valido.any(axis=-1) & (orbe <= np.maximum(orbe_max[i], orbe_max[j]))
+    return tem, idx, orbe
@@ -2,9 +2,15 @@
 # =============================================================
 import os, pytz, traceback
 from datetime import datetime
-from geopy.geocoders import Nominatim
+import numpy as np
 import swisseph as swe
 
+import cache_mapas
+import efemerides_tabela
+from metricas import etapa, ERROS
+from localidades import localizar
+from aspectos import detectar_aspectos, pares
+
 # ─── 1. EPHEMERIS ───────────────────────────────────────────────
 BASE_DIR  = os.path.dirname(os.path.abspath(__file__))
 EPHE_PATH = os.path.join(BASE_DIR, "sweph", "ephe")
@@ -17,7 +23,9 @@ print(f"[INFO] EPHE_PATH configurado: {EPHE_PATH}")
 from flatlib.chart    import Chart
 from flatlib.datetime import Datetime
 from flatlib.geopos   import GeoPos
-from flatlib          import const, aspects
+from flatlib          import const, props
+from flatlib.object   import House
+from flatlib.ephem.swe import SWE_OBJECTS, SWE_HOUSESYS
 
 # Corpos celestes que a biblioteca precisa calcular (sem o Ascendente)
 CORPOS_PARA_CALCULO = [
@@ -29,9 +37,28 @@ CORPOS_PARA_CALCULO = [
 # Pontos que usaremos para análise de aspectos (incluindo o Ascendente)
 PONTOS_PARA_ASPECTOS = CORPOS_PARA_CALCULO + [const.ASC]
 
+# Sistema de casas usado em todos os backends
+SISTEMA_CASAS = const.HOUSES_PLACIDUS
+
+# Backend de posições: "flatlib" (Chart completo), "swisseph" (direto) ou
+# "tabela" (efemerides_tabela.py, interpolação sobre arquivo mmap)
+BACKEND_PADRAO = os.environ.get("BACKEND_CALCULO", "flatlib")
+
+# Traceback completo nos erros (pode expor dados de nascimento no log)
+LOG_DETALHADO = os.environ.get("LOG_DETALHADO", "0") == "1"
+
 # ângulos numéricos para buscar aspectos
 ANGULOS = [0, 60, 90, 120, 180]
 
+# Tabelas por ponto para o motor vetorizado (mesmos orbes do flatlib;
+# o Ascendente não tem orbe próprio nem velocidade)
+_ORBES        = np.array([props.object.orb[p] if p in CORPOS_PARA_CALCULO else -1.0
+                          for p in PONTOS_PARA_ASPECTOS])
+_PLANETA      = np.array([p in CORPOS_PARA_CALCULO for p in PONTOS_PARA_ASPECTOS])
+_SO_CONJUNCAO = np.array([p in (const.NORTH_NODE, const.SOUTH_NODE, const.PARS_FORTUNA)
+                          for p in PONTOS_PARA_ASPECTOS])
+_ORBE_MAX     = np.array([5 if p in (const.SUN, const.MOON) else 3 for p in PONTOS_PARA_ASPECTOS])
+
 # --- DICIONÁRIOS DE TRADUÇÃO ---
 ID_PARA_PT = {
     const.SUN: "Sol", const.MOON: "Lua", const.MERCURY: "Mercúrio",
@@ -63,70 +90,157 @@ SIGNO_PT = {
 # helpers de formatação
 fmt_data = lambda d: d if "/" in d else f"{d[:2]}/{d[2:4]}/{d[4:]}"
 fmt_hora = lambda h: h if ":" in h else f"{h[:2]}:{h[2:]}"
-_casa    = lambda b: b.house.id if hasattr(b, 'house') and b.house is not None else 0
 
-# ─── 3. FUNÇÃO PRINCIPAL ───────────────────────────────────────
-def gerar_mapa_astral(nome:str, data:str, hora:str, cidade:str, estado:str):
+# ─── 3. ASPECTOS ───────────────────────────────────────────────
+def calcular_aspectos_lote(lons, vels):
+    """
+    Aspectos de vários mapas de uma vez. `lons`/`vels` têm forma
+    (n_mapas × n_pontos), na ordem de PONTOS_PARA_ASPECTOS.
+    Devolve uma lista de listas de dicts `aspectos`.
+    """
+    tem, idx, orbe = detectar_aspectos(np.atleast_2d(lons), np.atleast_2d(vels),
+                                       _ORBES, _PLANETA, _SO_CONJUNCAO, _ORBE_MAX, ANGULOS)
+    pi, pj = pares(len(PONTOS_PARA_ASPECTOS))
+    lote = []
+    for tem_m, idx_m, orbe_m in zip(tem, idx, orbe):
+        aspectos_exp = []
+        for k in np.flatnonzero(tem_m):
+            p1_id, p2_id = PONTOS_PARA_ASPECTOS[pi[k]], PONTOS_PARA_ASPECTOS[pj[k]]
+            tipo_en_lower = ANGULO_PARA_NOME_EN[ANGULOS[idx_m[k]]]
+            aspectos_exp.append({
+                "p1_id": p1_id, "p2_id": p2_id,
+                "p1_nome": ID_PARA_PT.get(p1_id, p1_id),
+                "p2_nome": ID_PARA_PT.get(p2_id, p2_id),
+                "tipo_en": tipo_en_lower,
+                "tipo_pt": TIPO_ASPECTO_PT.get(tipo_en_lower, tipo_en_lower.capitalize()),
+                "orbe": round(float(orbe_m[k]), 2)
+            })
+        lote.append(aspectos_exp)
+    return lote
+
+def calcular_aspectos(lons, vels):
+    """Aspectos de um único mapa (listas na ordem de PONTOS_PARA_ASPECTOS)."""
+    return calcular_aspectos_lote([lons], [vels])[0]
+
+# ─── 4. BACKENDS DE POSIÇÃO ────────────────────────────────────
+# Cada backend recebe o instante UTC e a posição e devolve, na ordem de
+# PONTOS_PARA_ASPECTOS, (longitudes, velocidades, casas), mais as 12
+# cúspides (longitudes, casa 1 a 12) para a roda do mapa.
+def _casas_de(lons, cuspides):
+    """Casa (1-12) de cada longitude, com a mesma tolerância de 5° do flatlib."""
+    c = np.asarray(cuspides, dtype=np.float64)
+    tamanho = np.remainder(np.roll(c, -1) - c, 360.0)
+    dist = np.remainder(np.asarray(lons)[:, None] - (c + House._OFFSET), 360.0)
+    dentro = dist < tamanho
+    return np.where(dentro.any(axis=1), dentro.argmax(axis=1) + 1, 0)
+
+def _posicoes_flatlib(dt_utc, lat, lon):
+    chart = Chart(
+        Datetime(dt_utc.strftime("%Y/%m/%d"), dt_utc.strftime("%H:%M"), "+00:00"),
+        GeoPos(lat, lon),
+        IDs=CORPOS_PARA_CALCULO,
+        hsys=SISTEMA_CASAS
+    )
+    objs  = [chart.get(pid) for pid in PONTOS_PARA_ASPECTOS]
+    casas = [chart.houses.getObjectHouse(obj) for obj in objs]
+    return ([obj.lon for obj in objs],
+            [getattr(obj, "lonspeed", 0.0) for obj in objs],
+            [casa.num() if casa is not None else 0 for casa in casas],
+            [casa.lon for casa in chart.houses])
+
+def _jd(dt_utc):
+    """Dia juliano UT com precisão de minuto, como o flatlib.Datetime."""
+    return swe.julday(dt_utc.year, dt_utc.month, dt_utc.day,
+                      dt_utc.hour + dt_utc.minute / 60.0)
+
+def _posicoes_swisseph(dt_utc, lat, lon):
+    """Um swe.calc_ut por corpo e um swe.houses; signos e casas por aritmética."""
+    jd = _jd(dt_utc)
+    lons, vels = [], []
+    for pid in CORPOS_PARA_CALCULO:
+        pos, _ = swe.calc_ut(jd, SWE_OBJECTS[pid])
+        lons.append(pos[0]); vels.append(pos[3])
+    cuspides, ascmc = swe.houses(jd, lat, lon, SWE_HOUSESYS[SISTEMA_CASAS])
+    lons.append(ascmc[0]); vels.append(0.0)
+    return lons, vels, _casas_de(lons, cuspides).tolist(), list(cuspides)
+
+_aviso_tabela = False
+
+def _posicoes_tabela(dt_utc, lat, lon):
+    """Corpos interpolados da tabela pré-calculada; casas ainda via swe.houses."""
+    global _aviso_tabela
+    jd = _jd(dt_utc)
+    tabela = efemerides_tabela.carregar()
+    if tabela is None or not efemerides_tabela.cobre(tabela, jd):
+        if tabela is None and not _aviso_tabela:
+            print("[AVISO] tabela de efemérides ausente; usando swisseph "
+                  "(gere com: python efemerides_tabela.py gerar)")
+            _aviso_tabela = True
+        return _posicoes_swisseph(dt_utc, lat, lon)
+    lons, vels = [], []
+    for pid in CORPOS_PARA_CALCULO:
+        lon_obj, vel = efemerides_tabela.posicao_escalar(tabela, pid, jd)
+        lons.append(lon_obj); vels.append(vel)
+    cuspides, ascmc = swe.houses(jd, lat, lon, SWE_HOUSESYS[SISTEMA_CASAS])
+    lons.append(ascmc[0]); vels.append(0.0)
+    return lons, vels, _casas_de(lons, cuspides).tolist(), list(cuspides)
+
+BACKENDS = {"flatlib": _posicoes_flatlib, "swisseph": _posicoes_swisseph,
+            "tabela": _posicoes_tabela}
+
+def montar_objetos(lons, casas):
+    """Monta o dict `objetos` a partir das longitudes e casas."""
+    objetos_mapa = {}
+    for pid, lon_obj, casa in zip(PONTOS_PARA_ASPECTOS, lons, casas):
+        signo = const.LIST_SIGNS[int(lon_obj / 30)]
+        objetos_mapa[pid] = {
+            "id": pid, "nome_pt": ID_PARA_PT.get(pid, pid),
+            "signo_pt": SIGNO_PT.get(signo, signo),
+            "grau_completo": lon_obj, "grau": int(lon_obj),
+            "minuto": int((lon_obj - int(lon_obj)) * 60), "casa": int(casa)
+        }
+    return objetos_mapa
+
+# ─── 5. FUNÇÃO PRINCIPAL ───────────────────────────────────────
+def gerar_mapa_astral(nome:str, data:str, hora:str, cidade:str, estado:str,
+                      backend:str = None):
     # --- CORREÇÃO APLICADA AQUI: O bloco try/except agora envolve toda a função ---
     try:
-        geo = Nominatim(user_agent="verba-astrologia-v4").geocode(f"{cidade}, {estado}, Brasil")
-        if not geo: raise ValueError("Localização não encontrada.")
-        lat, lon = float(geo.latitude), float(geo.longitude)
-
-        dt_local = pytz.timezone("America/Sao_Paulo").localize(
-            datetime.strptime(f"{fmt_data(data)} {fmt_hora(hora)}", "%d/%m/%Y %H:%M")
-        )
-        dt_utc = dt_local.astimezone(pytz.utc)
-
-        chart = Chart(
-            Datetime(dt_utc.strftime("%Y/%m/%d"), dt_utc.strftime("%H:%M"), "+00:00"),
-            GeoPos(lat, lon),
-            IDs=CORPOS_PARA_CALCULO,
-            hsys=const.HOUSES_PLACIDUS
-        )
-
-        objetos_mapa = {}
-        for pid in PONTOS_PARA_ASPECTOS:
-            obj = chart.get(pid)
-            objetos_mapa[pid] = {
-                "id": pid, "nome_pt": ID_PARA_PT.get(pid, pid),
-                "signo_pt": SIGNO_PT.get(obj.sign, obj.sign),
-                "grau_completo": obj.lon, "grau": int(obj.lon),
-                "minuto": int((obj.lon - int(obj.lon)) * 60), "casa": _casa(obj)
-            }
+        with etapa("geocodificacao"):
+            loc = localizar(cidade, estado)
+        lat, lon = loc.latitude, loc.longitude
+
+        with etapa("fuso"):
+            dt_local = pytz.timezone(loc.fuso).localize(
+                datetime.strptime(f"{fmt_data(data)} {fmt_hora(hora)}", "%d/%m/%Y %H:%M")
+            )
+            dt_utc = dt_local.astimezone(pytz.utc)
+
+        with etapa("cache"):
+            chave = cache_mapas.chave(dt_utc, lat, lon, SISTEMA_CASAS, PONTOS_PARA_ASPECTOS)
+            calculado = cache_mapas.obter(chave)
+        if calculado is None:
+            with etapa("posicoes"):
+                lons, vels, casas, cuspides = BACKENDS[backend or BACKEND_PADRAO](dt_utc, lat, lon)
+                objetos = montar_objetos(lons, casas)
+            with etapa("aspectos"):
+                aspectos = calcular_aspectos(lons, vels)
+            calculado = {"objetos": objetos, "aspectos": aspectos,
+                         "cuspides": [round(float(c), 6) for c in cuspides]}
+            cache_mapas.guardar(chave, calculado)
 
-        aspectos_exp = []
-        for i, p1_id in enumerate(PONTOS_PARA_ASPECTOS):
-            for p2_id in PONTOS_PARA_ASPECTOS[i + 1:]:
-                orbe_max = 5 if p1_id in [const.SUN, const.MOON] or p2_id in [const.SUN, const.MOON] else 3
-                aspecto = aspects.getAspect(chart.get(p1_id), chart.get(p2_id), ANGULOS)
-                
-                if aspecto and abs(aspecto.orb) <= orbe_max:
-                    tipo_en_lower = ""
-                    if isinstance(aspecto.type, str):
-                        tipo_en_lower = aspecto.type.lower()
-                    elif isinstance(aspecto.type, int):
-                        tipo_en_lower = ANGULO_PARA_NOME_EN.get(aspecto.type, "")
-
-                    if not tipo_en_lower: continue
-
-                    aspectos_exp.append({
-                        "p1_id": p1_id, "p2_id": p2_id,
-                        "p1_nome": ID_PARA_PT.get(p1_id, p1_id),
-                        "p2_nome": ID_PARA_PT.get(p2_id, p2_id),
-                        "tipo_en": tipo_en_lower,
-                        "tipo_pt": TIPO_ASPECTO_PT.get(tipo_en_lower, tipo_en_lower.capitalize()),
-                        "orbe": round(aspecto.orb, 2)
-                    })
-        
         return {
             "nome": nome, "data": fmt_data(data), "hora": fmt_hora(hora),
             "cidade": cidade, "estado": estado,
-            "objetos": objetos_mapa,
-            "aspectos": aspectos_exp
+            "objetos": calculado["objetos"],
+            "aspectos": calculado["aspectos"],
+            "cuspides": calculado["cuspides"]
         }
 
     except Exception as e:
-        print(f"[ERRO FATAL em gerar_mapa_astral] {e}")
-        traceback.print_exc()
-        return None
\ No newline at end of file
+        # Só o tipo do erro: a mensagem pode conter a data/local de nascimento
+        ERROS.incrementar("mapa")
+        print(f"[ERRO gerar_mapa_astral] {e.__class__.__name__}")
+        if LOG_DETALHADO:
+            traceback.print_exc()
+        return None
@@ -0,0 +1,287 @@
+# benchmark.py – medições de desempenho (cálculo, aspectos, PDF e endpoint)
+# =============================================================
+# Roda offline: a geocodificação é trocada por um stub com as coordenadas
+# do corpus fixo abaixo (séculos XIX a XXII, do equador ao círculo polar,
+# incluindo latitudes em que Placidus não tem solução), e o cache de mapas
+# fica desligado para que cada chamada faça o cálculo inteiro.
+#
+#   python benchmark.py                         # tudo, resultado em JSON
+#   python benchmark.py --apenas posicoes pdf   # só alguns grupos
+#   python benchmark.py --saida atual.json --base base.json --limite 0.25
+#
+# Com --base, compara a mediana (p50) de cada medição com a da base e sai
+# com código 1 se alguma ficou mais de `--limite` (fração) mais lenta.
+import os, sys, json, time, platform, argparse, contextlib, subprocess
+from datetime import datetime
+
+# Antes de importar astrologia: sem cache em disco e sem Nominatim
+os.environ["CACHE_MAPAS_DISCO"] = ""
+os.environ["NOMINATIM_FALLBACK"] = "0"
+
+import numpy as np
+import pytz
+
+import astrologia
+import cache_mapas
+from localidades import Localidade
+
+# ─── 1. CORPUS FIXO ─────────────────────────────────────────────
+# (nome, data, hora, cidade, estado, latitude, longitude, fuso)
+CORPUS = [
+    ("Ana",      "10/08/1990", "14:30", "São Paulo",      "SP", -23.5475, -46.6361, "America/Sao_Paulo"),
+    ("Bruno",    "01/01/2000", "00:00", "Rio de Janeiro", "RJ", -22.9028, -43.2075, "America/Sao_Paulo"),
+    ("Carla",    "29/02/1964", "23:59", "Manaus",         "AM",  -3.1019, -60.0250, "America/Manaus"),
+    ("Davi",     "15/11/1889", "09:15", "Rio de Janeiro", "RJ", -22.9028, -43.2075, "America/Sao_Paulo"),
+    ("Elisa",    "07/09/1822", "16:40", "São Paulo",      "SP", -23.5475, -46.6361, "America/Sao_Paulo"),
+    ("Fábio",    "21/06/2077", "12:00", "Porto Alegre",   "RS", -30.0328, -51.2302, "America/Sao_Paulo"),
+    ("Gabi",     "31/12/2099", "18:20", "Recife",         "PE",  -8.0539, -34.8811, "America/Recife"),
+    ("Hugo",     "03/03/1933", "05:05", "Belém",          "PA",  -1.4558, -48.5044, "America/Belem"),
+    ("Íris",     "12/10/1955", "07:45", "Macapá",         "AP",   0.0389, -51.0664, "America/Belem"),
+    ("João",     "22/04/1910", "13:10", "Lisboa",         "PT",  38.7167,  -9.1333, "Europe/Lisbon"),
+    ("Kátia",    "18/07/1969", "20:17", "Ushuaia",        "TF", -54.8019, -68.3030, "America/Argentina/Ushuaia"),
+    ("Lucas",    "05/05/2025", "10:00", "Reykjavík",      "IS",  64.1355, -21.8954, "Atlantic/Reykjavik"),
+    # Acima do círculo polar: Placidus não tem solução em parte do dia
+    ("Marta",    "21/12/1985", "12:00", "Tromsø",         "NO",  69.6496,  18.9560, "Europe/Oslo"),
+    ("Nuno",     "21/06/1985", "03:00", "Tromsø",         "NO",  69.6496,  18.9560, "Europe/Oslo"),
+    ("Olga",     "15/01/2010", "08:30", "Longyearbyen",   "SJ",  78.2232,  15.6267, "Arctic/Longyearbyen"),
+    ("Paulo",    "02/02/1899", "22:22", "Murmansk",       "RU",  68.9792,  33.0925, "Europe/Moscow"),
+    ("Quitéria", "14/08/1945", "06:00", "Tóquio",         "JP",  35.6895, 139.6917, "Asia/Tokyo"),
+    ("Rafael",   "09/09/1999", "09:09", "Sydney",         "AU", -33.8679, 151.2073, "Australia/Sydney"),
+    ("Sara",     "25/12/1850", "00:30", "Salvador",       "BA", -12.9711, -38.5108, "America/Bahia"),
+    ("Tiago",    "30/06/2150", "15:45", "Brasília",       "DF", -15.7797, -47.9297, "America/Sao_Paulo"),
+]
+
+_LOCAIS = {(c[3], c[4]): Localidade(c[3], c[4], c[5], c[6], c[7], 0) for c in CORPUS}
+
+def _localizar_stub(cidade, estado):
+    try:
+        return _LOCAIS[(cidade, estado)]
+    except KeyError:
+        raise ValueError("Localização não encontrada.") from None
+
+astrologia.localizar = _localizar_stub
+
+
+def _instante_utc(entrada):
+    _, data, hora, _, _, _, _, fuso = entrada
+    dt_local = pytz.timezone(fuso).localize(datetime.strptime(f"{data} {hora}", "%d/%m/%Y %H:%M"))
+    return dt_local.astimezone(pytz.utc)
+
+def _payload(entrada):
+    return dict(zip(("nome", "data", "hora", "cidade", "estado"), entrada[:5]))
+
+
+# ─── 2. MEDIÇÃO ─────────────────────────────────────────────────
+@contextlib.contextmanager
+def _silencio():
+    """Os módulos imprimem avisos/tracebacks por chamada; fora do relatório."""
+    with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo), contextlib.redirect_stderr(nulo):
+        yield
+
+def medir(funcao, entradas, repeticoes=1, itens_por_chamada=1):
+    """
+    Chama funcao(entrada) para cada entrada, `repeticoes` vezes (depois de
+    uma passada de aquecimento). Uma chamada que levanta ou devolve None
+    conta como erro. Devolve latências em ms e vazão em itens/s.
+    """
+    entradas = list(entradas)
+    with _silencio():
+        for entrada in entradas:
+            try:
+                funcao(entrada)
+            except Exception:
+                pass
+        tempos, erros = [], 0
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            for entrada in entradas:
+                t0 = time.perf_counter()
+                try:
+                    ok = funcao(entrada) is not None
+                except Exception:
+                    ok = False
+                tempos.append(time.perf_counter() - t0)
+                erros += not ok
+        total = time.perf_counter() - inicio
+    ms = np.array(tempos) * 1000.0
+    if not len(ms):
+        return {"chamadas": 0, "erros": 0}
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        "chamadas": len(ms), "erros": erros,
+        "vazao_por_s": round(len(ms) * itens_por_chamada / total, 2),
+        "media_ms": round(float(ms.mean()), 4), "min_ms": round(float(ms.min()), 4),
+        "p50_ms": round(float(p50), 4), "p95_ms": round(float(p95), 4),
+        "p99_ms": round(float(p99), 4), "max_ms": round(float(ms.max()), 4),
+    }
+
+
+# ─── 3. GRUPOS DE MEDIÇÕES ──────────────────────────────────────
+def bench_posicoes(repeticoes):
+    """Posições + casas por backend (sem aspectos nem cache)."""
+    entradas = [(_instante_utc(c), c[5], c[6]) for c in CORPUS]
+    return {f"posicoes.{nome}": medir(lambda e, f=funcao: f(*e), entradas, repeticoes)
+            for nome, funcao in astrologia.BACKENDS.items()}
+
+def _posicoes_validas():
+    resultado = []
+    with _silencio():
+        for c in CORPUS:
+            try:
+                lons, vels, _, _ = astrologia._posicoes_swisseph(_instante_utc(c), c[5], c[6])
+                resultado.append((lons, vels))
+            except Exception:
+                pass
+    return resultado
+
+def bench_aspectos(repeticoes):
+    """Detecção de aspectos: um mapa por chamada e o corpus inteiro num lote."""
+    posicoes = _posicoes_validas()
+    lons = np.array([p[0] for p in posicoes])
+    vels = np.array([p[1] for p in posicoes])
+    return {
+        "aspectos": medir(lambda p: astrologia.calcular_aspectos(*p), posicoes, repeticoes),
+        "aspectos.lote": medir(lambda _: astrologia.calcular_aspectos_lote(lons, vels),
+                               [None], repeticoes * 10, itens_por_chamada=len(posicoes)),
+    }
+
+def bench_mapa(repeticoes):
+    """gerar_mapa_astral completo, com o cache em memória desligado e ligado."""
+    resultados = {}
+    maximo = cache_mapas.MAX_MEMORIA
+    try:
+        cache_mapas.MAX_MEMORIA = 0
+        cache_mapas.limpar_memoria()
+        resultados["mapa.sem_cache"] = medir(lambda c: astrologia.gerar_mapa_astral(*c[:5]),
+                                             CORPUS, repeticoes)
+        cache_mapas.MAX_MEMORIA = max(maximo, len(CORPUS))
+        resultados["mapa.cache_memoria"] = medir(lambda c: astrologia.gerar_mapa_astral(*c[:5]),
+                                                 CORPUS, repeticoes)
+    finally:
+        cache_mapas.MAX_MEMORIA = maximo
+        cache_mapas.limpar_memoria()
+    return resultados
+
+def _mapas_validos():
+    with _silencio():
+        mapas = [astrologia.gerar_mapa_astral(*c[:5]) for c in CORPUS]
+    return [m for m in mapas if m is not None]
+
+def bench_pdf(repeticoes):
+    """Montagem do PDF em memória a partir de mapas já calculados."""
+    from pdf import criar_pdf_bytes
+    return {"pdf": medir(criar_pdf_bytes, _mapas_validos(), repeticoes)}
+
+def bench_roda(repeticoes):
+    """Roda do mapa: por mapa com a geometria da base em cache, base fria e SVG."""
+    import roda
+
+    def base_fria(mapa):
+        roda._geometria_base.cache_clear()
+        return roda.desenhar(mapa)
+
+    mapas = _mapas_validos()
+    return {
+        "roda.desenho":   medir(roda.desenhar, mapas, repeticoes),
+        "roda.base_fria": medir(base_fria, mapas, repeticoes),
+        "roda.svg":       medir(roda.svg, mapas, repeticoes),
+    }
+
+def bench_endpoint(repeticoes):
+    """POST /api/mapa completo (JSON -> PDF) pelo cliente de teste do Flask."""
+    from app import app
+    cliente = app.test_client()
+    maximo = cache_mapas.MAX_MEMORIA
+
+    def requisicao(entrada):
+        resp = cliente.post("/api/mapa", json=_payload(entrada))
+        resp.get_data()
+        return resp if resp.status_code == 200 else None
+
+    try:
+        cache_mapas.MAX_MEMORIA = 0
+        cache_mapas.limpar_memoria()
+        return {"endpoint.mapa": medir(requisicao, CORPUS, repeticoes)}
+    finally:
+        cache_mapas.MAX_MEMORIA = maximo
+
+GRUPOS = {
+    "posicoes": bench_posicoes,
+    "aspectos": bench_aspectos,
+    "mapa":     bench_mapa,
+    "pdf":      bench_pdf,
+    "roda":     bench_roda,
+    "endpoint": bench_endpoint,
+}
+
+
+# ─── 4. EXECUÇÃO, JSON E COMPARAÇÃO ─────────────────────────────
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, cwd=astrologia.BASE_DIR, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+def executar(grupos=None, repeticoes=3) -> dict:
+    """Roda os grupos pedidos (todos por padrão) e devolve o relatório."""
+    medicoes = {}
+    for nome in grupos or GRUPOS:
+        print(f"[INFO] medindo {nome}...", flush=True)
+        medicoes.update(GRUPOS[nome](repeticoes))
+    return {
+        "quando": datetime.now(pytz.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "backend_padrao": astrologia.BACKEND_PADRAO,
+        "corpus": len(CORPUS), "repeticoes": repeticoes,
+        "medicoes": medicoes,
+    }
+
+def comparar(atual: dict, base: dict, limite: float) -> list:
+    """Medições cujo p50 piorou mais que `limite` (fração) em relação à base."""
+    regressoes = []
+    for nome, med in sorted(atual["medicoes"].items()):
+        ref = base.get("medicoes", {}).get(nome)
+        if not ref or not ref.get("p50_ms") or "p50_ms" not in med:
+            continue
+        razao = med["p50_ms"] / ref["p50_ms"]
+        marca = "REGRESSÃO" if razao > 1 + limite else "ok"
+        print(f"  {nome:<24} p50 {ref['p50_ms']:>10.3f} -> {med['p50_ms']:>10.3f} ms  ({razao:5.2f}x)  {marca}")
+        if razao > 1 + limite:
+            regressoes.append(nome)
+    return regressoes
+
+def _imprimir(relatorio):
+    print(f"{'medição':<24} {'n':>5} {'erros':>5} {'itens/s':>10} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}")
+    for nome, m in relatorio["medicoes"].items():
+        if m["chamadas"]:
+            print(f"{nome:<24} {m['chamadas']:>5} {m['erros']:>5} {m['vazao_por_s']:>10.1f} "
+                  f"{m['p50_ms']:>10.3f} {m['p95_ms']:>10.3f} {m['p99_ms']:>10.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks do mapa astral (offline)")
+    parser.add_argument("--apenas", nargs="+", choices=list(GRUPOS), help="grupos a rodar")
+    parser.add_argument("--repeticoes", type=int, default=3, help="passadas pelo corpus")
+    parser.add_argument("--saida", default="benchmark.json", help="arquivo JSON do resultado")
+    parser.add_argument("--base", help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--limite", type=float, default=0.20,
+                        help="piora máxima aceita no p50 (0.20 = 20%%)")
+    args = parser.parse_args()
+
+    relatorio = executar(args.apenas, args.repeticoes)
+    _imprimir(relatorio)
+    with open(args.saida, "w", encoding="utf-8") as f:
+        json.dump(relatorio, f, ensure_ascii=False, indent=2)
+    print(f"[INFO] resultado salvo em {args.saida}")
+
+    if args.base:
+        with open(args.base, encoding="utf-8") as f:
+            base = json.load(f)
+        print(f"[INFO] comparando com {args.base} (limite {args.limite:.0%})")
+        regressoes = comparar(relatorio, base, args.limite)
+        if regressoes:
+            print(f"[ERRO] regressão acima do limite em: {', '.join(regressoes)}")
+            sys.exit(1)
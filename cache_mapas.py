@@ -0,0 +1,147 @@
+# cache_mapas.py – cache endereçado por conteúdo para posições e aspectos
+# =============================================================
+# Dois níveis na frente do cálculo de gerar_mapa_astral:
+#   1. LRU em memória (por processo);
+#   2. SQLite em disco, que sobrevive a reinícios e é compartilhado entre
+#      processos, com despejo por tamanho (os menos acessados saem antes).
+# A chave é um hash do (instante UTC, lat, lon, sistema de casas, corpos):
+# o `nome` fica de fora, então a personalização nunca impede o reuso.
+import os, json, time, sqlite3, hashlib, threading
+from collections import OrderedDict
+
+# ─── 1. CONFIGURAÇÃO ────────────────────────────────────────────
+BASE_DIR        = os.path.dirname(os.path.abspath(__file__))
+MAX_MEMORIA     = int(os.environ.get("CACHE_MAPAS_MEMORIA", "4096"))          # entradas
+CAMINHO_DISCO   = os.environ.get("CACHE_MAPAS_DISCO",
+                                 os.path.join(BASE_DIR, "cache", "mapas.sqlite3"))  # "" desliga
+MAX_DISCO_BYTES = int(float(os.environ.get("CACHE_MAPAS_DISCO_MB", "64")) * 1024 * 1024)
+VERSAO          = 2   # incremente quando o formato de `objetos`/`aspectos` mudar
+
+# De quantas em quantas gravações o tamanho do arquivo é conferido
+_INTERVALO_DESPEJO = 64
+
+_lock     = threading.Lock()
+_memoria  = OrderedDict()
+_contador = {"hits_memoria": 0, "hits_disco": 0, "misses": 0,
+             "gravacoes": 0, "despejos_memoria": 0, "despejos_disco": 0}
+
+
+# ─── 2. CHAVE ───────────────────────────────────────────────────
+def chave(dt_utc, lat: float, lon: float, hsys: str, corpos) -> str:
+    """Hash normalizado do nascimento (sem nome, com precisão de minuto)."""
+    normalizado = json.dumps([
+        VERSAO, dt_utc.strftime("%Y-%m-%dT%H:%MZ"),
+        round(float(lat), 6), round(float(lon), 6), hsys, list(corpos)
+    ], separators=(",", ":"))
+    return hashlib.sha256(normalizado.encode()).hexdigest()
+
+
+# ─── 3. NÍVEL 2: SQLITE ─────────────────────────────────────────
+_conexao = None
+_pid     = None
+_gravacoes_desde_despejo = 0
+
+def _db():
+    """Conexão por processo (não atravessa fork); None se o disco estiver desligado."""
+    global _conexao, _pid
+    if not CAMINHO_DISCO:
+        return None
+    if _conexao is None or _pid != os.getpid():
+        os.makedirs(os.path.dirname(CAMINHO_DISCO) or ".", exist_ok=True)
+        _conexao = sqlite3.connect(CAMINHO_DISCO, timeout=5, check_same_thread=False,
+                                   isolation_level=None)
+        _conexao.execute("PRAGMA journal_mode=WAL")
+        _conexao.execute("PRAGMA synchronous=NORMAL")
+        _conexao.execute("""CREATE TABLE IF NOT EXISTS mapas (
+                                chave   TEXT PRIMARY KEY,
+                                valor   TEXT NOT NULL,
+                                tamanho INTEGER NOT NULL,
+                                acesso  REAL NOT NULL)""")
+        _conexao.execute("CREATE INDEX IF NOT EXISTS mapas_acesso ON mapas(acesso)")
+        _pid = os.getpid()
+    return _conexao
+
+def _despejar_disco(db):
+    total = db.execute("SELECT COALESCE(SUM(tamanho), 0) FROM mapas").fetchone()[0]
+    while total > MAX_DISCO_BYTES:
+        linhas = db.execute("SELECT chave, tamanho FROM mapas ORDER BY acesso LIMIT 64").fetchall()
+        if not linhas:
+            break
+        db.executemany("DELETE FROM mapas WHERE chave = ?", [(c,) for c, _ in linhas])
+        total -= sum(t for _, t in linhas)
+        _contador["despejos_disco"] += len(linhas)
+
+def _ler_disco(k):
+    try:
+        db = _db()
+        if db is None:
+            return None
+        linha = db.execute("SELECT valor FROM mapas WHERE chave = ?", (k,)).fetchone()
+        if linha is not None:
+            db.execute("UPDATE mapas SET acesso = ? WHERE chave = ?", (time.time(), k))
+            return linha[0]
+    except sqlite3.Error as e:
+        print(f"[AVISO cache_mapas] leitura em disco falhou: {e}")
+    return None
+
+def _gravar_disco(k, valor):
+    global _gravacoes_desde_despejo
+    try:
+        db = _db()
+        if db is None:
+            return
+        db.execute("INSERT OR REPLACE INTO mapas (chave, valor, tamanho, acesso) VALUES (?, ?, ?, ?)",
+                   (k, valor, len(valor), time.time()))
+        _gravacoes_desde_despejo += 1
+        if _gravacoes_desde_despejo >= _INTERVALO_DESPEJO:
+            _gravacoes_desde_despejo = 0
+            _despejar_disco(db)
+    except sqlite3.Error as e:
+        print(f"[AVISO cache_mapas] gravação em disco falhou: {e}")
+
+
+# ─── 4. API ─────────────────────────────────────────────────────
+def _lembrar(k, valor):
+    _memoria[k] = valor
+    _memoria.move_to_end(k)
+    while len(_memoria) > MAX_MEMORIA:
+        _memoria.popitem(last=False)
+        _contador["despejos_memoria"] += 1
+
+def obter(k: str):
+    """Devolve {"objetos", "aspectos"} (cópia nova) ou None."""
+    with _lock:
+        valor = _memoria.get(k)
+        if valor is not None:
+            _memoria.move_to_end(k)
+            _contador["hits_memoria"] += 1
+        else:
+            valor = _ler_disco(k)
+            if valor is not None:
+                _lembrar(k, valor)
+                _contador["hits_disco"] += 1
+            else:
+                _contador["misses"] += 1
+                return None
+    return json.loads(valor)
+
+def guardar(k: str, calculado: dict):
+    """Grava nos dois níveis."""
+    valor = json.dumps(calculado, ensure_ascii=False, separators=(",", ":"))
+    with _lock:
+        _lembrar(k, valor)
+        _gravar_disco(k, valor)
+        _contador["gravacoes"] += 1
+
+def estatisticas() -> dict:
+    """Contadores de acerto/erro e ocupação atual."""
+    with _lock:
+        stats = dict(_contador, entradas_memoria=len(_memoria))
+    consultas = stats["hits_memoria"] + stats["hits_disco"] + stats["misses"]
+    stats["taxa_acerto"] = round((consultas - stats["misses"]) / consultas, 4) if consultas else 0.0
+    return stats
+
+def limpar_memoria():
+    """Esvazia só o nível em memória (útil em benchmarks e testes manuais)."""
+    with _lock:
+        _memoria.clear()
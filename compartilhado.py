@@ -0,0 +1,66 @@
+# compartilhado.py – estado compartilhado entre os workers (SQLite)
+# =============================================================
+# Tarefas assíncronas (status, tempos e o PDF pronto) e os resultados de
+# /api/mapa/dados precisam ser vistos por qualquer worker do gunicorn:
+# o polling de uma tarefa ou o GET de um resultado pode cair num processo
+# diferente do que o criou. Ficam num SQLite em WAL no mesmo diretório
+# do cache de mapas, com uma conexão por processo (não atravessa fork).
+# ESTADO_DB="" usa um banco em memória: só serve com um processo.
+import os, sqlite3, threading
+
+# ─── 1. CONFIGURAÇÃO ────────────────────────────────────────────
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CAMINHO  = os.environ.get("ESTADO_DB", os.path.join(BASE_DIR, "cache", "estado.sqlite3"))
+
+_ESQUEMA = [
+    """CREATE TABLE IF NOT EXISTS tarefas (
+           id       TEXT PRIMARY KEY,
+           status   TEXT NOT NULL,
+           criada   REAL NOT NULL,
+           fim      REAL,
+           erro     TEXT,
+           tempos   TEXT NOT NULL DEFAULT '{}',
+           filename TEXT,
+           pdf      BLOB)""",
+    "CREATE INDEX IF NOT EXISTS tarefas_status ON tarefas(status)",
+    """CREATE TABLE IF NOT EXISTS tarefas_tempos (
+           etapa TEXT PRIMARY KEY,
+           n     INTEGER NOT NULL,
+           soma  REAL NOT NULL,
+           max   REAL NOT NULL)""",
+    """CREATE TABLE IF NOT EXISTS resultados (
+           id     TEXT PRIMARY KEY,
+           valor  TEXT NOT NULL,
+           acesso REAL NOT NULL)""",
+    "CREATE INDEX IF NOT EXISTS resultados_acesso ON resultados(acesso)",
+]
+
+_lock    = threading.Lock()
+_conexao = None
+_pid     = None
+
+
+# ─── 2. CONEXÃO ─────────────────────────────────────────────────
+def _db():
+    global _conexao, _pid
+    if _conexao is None or _pid != os.getpid():
+        if CAMINHO:
+            os.makedirs(os.path.dirname(CAMINHO) or ".", exist_ok=True)
+        _conexao = sqlite3.connect(CAMINHO or ":memory:", timeout=10, check_same_thread=False,
+                                   isolation_level=None)
+        _conexao.execute("PRAGMA journal_mode=WAL")
+        _conexao.execute("PRAGMA synchronous=NORMAL")
+        for comando in _ESQUEMA:
+            _conexao.execute(comando)
+        _pid = os.getpid()
+    return _conexao
+
+def consultar(sql: str, parametros=()) -> list:
+    """Executa `sql` (autocommit) e devolve todas as linhas."""
+    with _lock:
+        return _db().execute(sql, parametros).fetchall()
+
+def executar(sql: str, parametros=()) -> int:
+    """Executa um comando de escrita (autocommit) e devolve as linhas afetadas."""
+    with _lock:
+        return _db().execute(sql, parametros).rowcount
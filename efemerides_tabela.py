@@ -0,0 +1,221 @@
+# efemerides_tabela.py – tabela pré-calculada de longitudes (Chebyshev + mmap)
+# =============================================================
+# Para trabalho em alto volume, as longitudes de CORPOS_PARA_CALCULO entre
+# 1900 e 2100 ficam num arquivo binário com coeficientes de Chebyshev por
+# segmento de tempo (adaptativo perto das conjunções com o Sol). O arquivo
+# é aberto com np.memmap (somente leitura), então os processos workers
+# compartilham as mesmas páginas, e a posição de qualquer instante sai de
+# uma avaliação polinomial (erro < 0,05").
+#
+#   python efemerides_tabela.py gerar     # constrói a partir de sweph/ephe
+#   python efemerides_tabela.py validar   # compara com swe.calc_ut
+#
+# Formato: b"VERBAEPH" | uint64 tamanho do cabeçalho | cabeçalho JSON
+# (alinhado em 64 bytes) | para cada corpo, em float64: inícios (JD) e
+# durações dos segmentos, seguidos da matriz de coeficientes.
+import os, sys, json, bisect, struct, argparse
+import numpy as np
+import swisseph as swe
+
+# ─── 1. CONFIGURAÇÃO ────────────────────────────────────────────
+BASE_DIR     = os.path.dirname(os.path.abspath(__file__))
+EPHE_PATH    = os.path.join(BASE_DIR, "sweph", "ephe")
+TABELA_PATH  = os.environ.get("EFEMERIDES_TABELA",
+                              os.path.join(BASE_DIR, "dados", "efemerides_1900_2100.bin"))
+MAGICO       = b"VERBAEPH"
+VERSAO       = 1
+JD_INICIO    = swe.julday(1900, 1, 1, 0.0)
+JD_FIM       = swe.julday(2101, 1, 1, 0.0)
+TOLERANCIA   = 0.05     # segundos de arco, conferido na geração
+DURACAO_MIN  = 1 / 16   # dias; limite da subdivisão adaptativa
+
+# (código swisseph, dias por segmento, grau do polinômio) – flatlib usa o
+# nodo médio (10) para o Nodo Norte. Segmentos mais curtos para os corpos
+# rápidos, como nas efemérides JPL.
+SEGMENTOS = {
+    "Sun":       (swe.SUN,       16, 12),
+    "Moon":      (swe.MOON,       4, 13),
+    "Mercury":   (swe.MERCURY,    8, 13),
+    "Venus":     (swe.VENUS,     16, 13),
+    "Mars":      (swe.MARS,      16, 12),
+    "Jupiter":   (swe.JUPITER,   32, 12),
+    "Saturn":    (swe.SATURN,    32, 12),
+    "Uranus":    (swe.URANUS,    32, 12),
+    "Neptune":   (swe.NEPTUNE,   32, 12),
+    "Pluto":     (swe.PLUTO,     32, 12),
+    "North Node":(swe.MEAN_NODE, 32, 12),
+    "Chiron":    (swe.CHIRON,    32, 12),
+}
+
+
+# ─── 2. GERAÇÃO ─────────────────────────────────────────────────
+def _nos(grau):
+    """Nós de Chebyshev (1ª espécie) em [-1, 1] e a matriz T_j(x_k)."""
+    n = grau + 1
+    x = np.cos(np.pi * (np.arange(n) + 0.5) / n)
+    return x, np.polynomial.chebyshev.chebvander(x, grau)
+
+def _longitudes(codigo, jds):
+    lon = np.empty_like(jds)
+    for idx, jd in np.ndenumerate(jds):
+        lon[idx] = swe.calc_ut(float(jd), codigo)[0][0]
+    return lon
+
+def _ajustar(codigo, dias, grau):
+    """
+    Segmentos adaptativos: começa com segmentos de `dias` e divide ao meio
+    os que não atingem TOLERANCIA nos pontos de conferência (a deflexão da
+    luz perto da conjunção com o Sol cria picos estreitos que um polinômio
+    de 32 dias não acompanha). Devolve (inícios, durações, coeficientes).
+    """
+    x, T = _nos(grau)
+    conferencia = np.linspace(-1.0, 1.0, 4 * (grau + 1) + 1)
+    T_conf = np.polynomial.chebyshev.chebvander(conferencia, grau)
+    n_seg = int(np.ceil((JD_FIM - JD_INICIO) / dias))
+    inicio = JD_INICIO + dias * np.arange(n_seg)
+    duracao = np.full(n_seg, float(dias))
+    aceitos = []
+    while inicio.size:
+        jds = inicio[:, None] + (x[None, :] + 1.0) * duracao[:, None] / 2.0
+        # cada segmento é desenrolado a partir do próprio primeiro nó
+        lon = np.unwrap(_longitudes(codigo, jds), period=360.0, axis=1)
+        coef = lon @ T * (2.0 / (grau + 1))
+        coef[:, 0] /= 2.0
+        jds_conf = inicio[:, None] + (conferencia[None, :] + 1.0) * duracao[:, None] / 2.0
+        ref = _longitudes(codigo, jds_conf)
+        erro = np.abs((coef @ T_conf.T - ref + 180.0) % 360.0 - 180.0).max(axis=1) * 3600.0
+        ok = (erro <= TOLERANCIA) | (duracao <= DURACAO_MIN)
+        aceitos.append((inicio[ok], duracao[ok], coef[ok]))
+        metade = duracao[~ok] / 2.0
+        inicio = np.concatenate([inicio[~ok], inicio[~ok] + metade])
+        duracao = np.concatenate([metade, metade])
+    inicios, duracoes, coefs = (np.concatenate(partes) for partes in zip(*aceitos))
+    ordem = np.argsort(inicios)
+    return inicios[ordem], duracoes[ordem], coefs[ordem]
+
+def gerar(caminho=TABELA_PATH):
+    swe.set_ephe_path(EPHE_PATH)
+    cabecalho = {"versao": VERSAO, "jd_inicio": JD_INICIO, "jd_fim": JD_FIM, "corpos": {}}
+    blocos, offset = [], 0
+    for pid, (codigo, dias, grau) in SEGMENTOS.items():
+        inicios, duracoes, coef = _ajustar(codigo, dias, grau)
+        cabecalho["corpos"][pid] = {"offset": offset, "n_seg": coef.shape[0], "grau": grau}
+        for bloco in (inicios, duracoes, coef):
+            blocos.append(np.ascontiguousarray(bloco, dtype="<f8"))
+            offset += bloco.size
+        print(f"[INFO] {pid}: {coef.shape[0]} segmentos (base {dias} dias), grau {grau}")
+    texto = json.dumps(cabecalho).encode()
+    texto += b" " * (-(len(MAGICO) + 8 + len(texto)) % 64)
+    os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+    temporario = caminho + ".tmp"
+    with open(temporario, "wb") as f:
+        f.write(MAGICO + struct.pack("<Q", len(texto)) + texto)
+        for bloco in blocos:
+            f.write(bloco.tobytes())
+    os.replace(temporario, caminho)
+    print(f"[INFO] tabela gravada em {caminho} ({os.path.getsize(caminho) / 1e6:.1f} MB)")
+
+
+# ─── 3. LEITURA E INTERPOLAÇÃO ──────────────────────────────────
+_tabela = None
+
+def carregar(caminho=TABELA_PATH):
+    """Abre a tabela via mmap (uma vez por processo); None se o arquivo não existe."""
+    global _tabela
+    if _tabela is not None and _tabela["caminho"] == caminho:
+        return _tabela
+    if not os.path.exists(caminho):
+        return None
+    with open(caminho, "rb") as f:
+        if f.read(len(MAGICO)) != MAGICO:
+            raise ValueError(f"{caminho} não é uma tabela de efemérides")
+        tamanho = struct.unpack("<Q", f.read(8))[0]
+        cabecalho = json.loads(f.read(tamanho))
+    if cabecalho["versao"] != VERSAO:
+        raise ValueError(f"{caminho}: versão {cabecalho['versao']}, esperada {VERSAO}")
+    dados = np.memmap(caminho, dtype="<f8", mode="r", offset=len(MAGICO) + 8 + tamanho)
+    corpos = {}
+    for pid, c in cabecalho["corpos"].items():
+        n, g, o = c["n_seg"], c["grau"] + 1, c["offset"]
+        corpos[pid] = (dados[o:o + n], dados[o + n:o + 2 * n],
+                       dados[o + 2 * n:o + 2 * n + n * g].reshape(n, g))
+    _tabela = {"caminho": caminho, "jd_inicio": cabecalho["jd_inicio"],
+               "jd_fim": cabecalho["jd_fim"], "corpos": corpos,
+               # cópia em lista só dos inícios, para o bisect do caminho escalar
+               "inicios_lista": {pid: c[0].tolist() for pid, c in corpos.items()}}
+    return _tabela
+
+def cobre(tabela, jd) -> bool:
+    jd = np.asarray(jd)
+    return bool(np.all((jd >= tabela["jd_inicio"]) & (jd < tabela["jd_fim"])))
+
+def posicao_escalar(tabela, pid, jd: float):
+    """Mesma conta de `posicao` para um único instante, sem overhead de arrays."""
+    _, duracoes, coef = tabela["corpos"][pid]
+    inicios = tabela["inicios_lista"][pid]
+    seg = min(max(bisect.bisect_right(inicios, jd) - 1, 0), len(inicios) - 1)
+    dias = float(duracoes[seg])
+    x = 2.0 * (jd - inicios[seg]) / dias - 1.0
+    c = coef[seg].tolist()
+    b1 = b2 = d1 = d2 = 0.0
+    for k in range(len(c) - 1, 0, -1):
+        b1, b2 = 2.0 * x * b1 - b2 + c[k], b1
+        d1, d2 = 2.0 * x * d1 - d2 + k * c[k], d1
+    return (x * b1 - b2 + c[0]) % 360.0, d1 * (2.0 / dias)
+
+def posicao(tabela, pid, jd):
+    """
+    Longitude (0–360) e velocidade (°/dia) de `pid` em `jd` (escalar ou
+    array), por Clenshaw vetorizado sobre os coeficientes do segmento.
+    """
+    inicios, duracoes, coef = tabela["corpos"][pid]
+    jd = np.asarray(jd, dtype=np.float64)
+    seg = np.clip(np.searchsorted(inicios, jd, side="right") - 1, 0, coef.shape[0] - 1)
+    dias = duracoes[seg]
+    x = 2.0 * (jd - inicios[seg]) / dias - 1.0
+    c = coef[seg]                                   # (..., grau+1)
+    # Clenshaw para o valor (base T) e para a derivada, Σ k·c_k·U_{k-1}(x)
+    b1 = b2 = d1 = d2 = np.zeros_like(x)
+    for k in range(c.shape[-1] - 1, 0, -1):
+        b1, b2 = 2.0 * x * b1 - b2 + c[..., k], b1
+        d1, d2 = 2.0 * x * d1 - d2 + k * c[..., k], d1
+    valor = x * b1 - b2 + c[..., 0]
+    return np.remainder(valor, 360.0), d1 * (2.0 / dias)
+
+
+# ─── 4. VALIDAÇÃO ───────────────────────────────────────────────
+def validar(amostras=20000, semente=1, limite_arcsec=1.0) -> bool:
+    """Compara a tabela com swe.calc_ut em instantes aleatórios."""
+    tabela = carregar()
+    if tabela is None:
+        print(f"[ERRO] tabela não encontrada em {TABELA_PATH}; rode 'gerar' antes.")
+        return False
+    swe.set_ephe_path(EPHE_PATH)
+    rnd = np.random.default_rng(semente)
+    jds = rnd.uniform(tabela["jd_inicio"], tabela["jd_fim"], amostras)
+    ok = True
+    for pid, (codigo, _, _) in SEGMENTOS.items():
+        lon, vel = posicao(tabela, pid, jds)
+        ref = np.array([swe.calc_ut(float(jd), codigo)[0] for jd in jds])
+        erro = np.abs((lon - ref[:, 0] + 180.0) % 360.0 - 180.0) * 3600.0
+        erro_vel = np.abs(vel - ref[:, 3])
+        situacao = "ok" if erro.max() < limite_arcsec else "FALHOU"
+        ok &= situacao == "ok"
+        print(f"{pid:<11} máx {erro.max():.4f}\"  média {erro.mean():.5f}\"  "
+              f"vel máx {erro_vel.max():.2e}°/dia  {situacao}")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__ and __doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="comando", required=True)
+    p_gerar = sub.add_parser("gerar", help="constrói a tabela a partir de sweph/ephe")
+    p_gerar.add_argument("--saida", default=TABELA_PATH)
+    p_validar = sub.add_parser("validar", help="compara a tabela com swe.calc_ut")
+    p_validar.add_argument("--amostras", type=int, default=20000)
+    p_validar.add_argument("--limite", type=float, default=1.0, help="erro máximo em segundos de arco")
+    args = parser.parse_args()
+    if args.comando == "gerar":
+        gerar(args.saida)
+    else:
+        sys.exit(0 if validar(args.amostras, limite_arcsec=args.limite) else 1)
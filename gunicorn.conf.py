@@ -0,0 +1,70 @@
+# gunicorn.conf.py – servidor de produção
+# =============================================================
+#   gunicorn -c gunicorn.conf.py app:app
+#
+# preload_app: o app é importado e aquecido (mapa + PDF de exemplo) uma
+# vez no processo pai, antes do fork; os workers herdam módulos, estilos,
+# imagens e páginas das efemérides em copy-on-write e já nascem prontos.
+#
+# Um worker por núcleo por padrão, todos com as mesmas páginas do pai.
+# O que precisa ser visto por qualquer worker fica fora da memória do
+# processo: tarefas assíncronas e resultados de /api/mapa/dados no SQLite
+# compartilhado (compartilhado.py), e o /metrics soma os instantâneos de
+# cada worker em METRICAS_DIR (metricas.py, seção 5). O pool de cálculo
+# de cada worker fica com a sua fração dos núcleos.
+import os, shutil, tempfile
+
+bind    = f"0.0.0.0:{os.environ.get('PORT', '10000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+threads = int(os.environ.get("GUNICORN_THREADS", "4"))   # SSE e downloads não prendem o worker
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
+preload_app = True
+
+# Lidos na importação do app (preload), por isso definidos aqui
+os.environ.setdefault("POOL_PROCESSOS", str(max(1, (os.cpu_count() or 1) // workers)))
+os.environ.setdefault("METRICAS_DIR", os.path.join(tempfile.gettempdir(), "verba-metricas"))
+
+# Só o caminho (%(U)s), sem query string nem Referer: nada de dados de nascimento no log
+accesslog = "-"
+access_log_format = '%(h)s %(t)s "%(m)s %(U)s" %(s)s %(B)s %(M)sms'
+
+
+def on_starting(server):
+    """Instantâneos de métricas de uma execução anterior não valem mais."""
+    diretorio = os.environ["METRICAS_DIR"]
+    shutil.rmtree(diretorio, ignore_errors=True)
+    os.makedirs(diretorio, exist_ok=True)
+
+
+def when_ready(server):
+    """Roda no pai, depois do preload e antes de criar os workers."""
+    if os.environ.get("AQUECER", "1") == "1":
+        from app import aquecer
+        aquecer()
+    else:
+        from app import PRONTO
+        PRONTO.set()
+
+
+def post_fork(server, worker):
+    """
+    O swisseph guarda os .se1 abertos; descritores herdados do pai têm a
+    posição de leitura compartilhada entre os workers. Cada worker reabre
+    os seus (as páginas continuam compartilhadas pelo cache do sistema).
+    """
+    import swisseph as swe
+    from astrologia import EPHE_PATH
+    swe.close()
+    swe.set_ephe_path(EPHE_PATH)
+
+
+def worker_exit(server, worker):
+    """No worker, ao sair: o instantâneo agendado (se houver) vai já para o disco."""
+    import metricas
+    metricas.persistir(agora=True)
+
+
+def child_exit(server, worker):
+    """Os contadores de um worker que saiu continuam somando no /metrics."""
+    import metricas
+    metricas.recolher(worker.pid)
@@ -0,0 +1,110 @@
+# interpretacoes.py – índice pré-processado do banco de textos
+# =============================================================
+# Carrega textos_astrologicos uma vez e guarda, para cada texto e estilo,
+# os fragmentos já analisados pelo parser XML do ReportLab (as marcações
+# <b>, <br/>…) e a quebra de linhas já calculada para cada largura. Cada
+# relatório recebe um Paragraph novo, mas que não reanalisa o markup nem
+# refaz a quebra de linhas.
+import pickle
+import threading
+
+from reportlab.platypus import Paragraph
+from reportlab.platypus.paraparser import ParaParser
+from reportlab.platypus.paragraph import cleanBlockQuotedText, textTransformFrags
+
+from textos_astrologicos import (
+    INTRO_METAFORA, COMO_LER, TEXTO_SOL, TEXTO_LUA, TEXTO_ASC,
+    TEXTOS_ASPECTOS
+)
+
+# Limite de segurança: o cache é só para textos fixos, não para nomes etc.
+MAX_ENTRADAS = 1024
+
+_lock     = threading.Lock()
+_cache    = {}   # (texto, nome do estilo) -> (estilo, frags, quebras)
+_contador = {"hits": 0, "misses": 0}
+
+
+# ─── 1. PARÁGRAFOS PREPARADOS ───────────────────────────────────
+class ParagrafoPreparado(Paragraph):
+    """Paragraph que reaproveita frags analisados e quebras de linha por largura."""
+
+    def __init__(self, text, style=None, bulletText=None, frags=None,
+                 caseSensitive=1, encoding='utf8', quebras=None):
+        self._quebras = {} if quebras is None else quebras
+        Paragraph.__init__(self, text, style, bulletText, frags, caseSensitive, encoding)
+        self._frags_originais = self.frags
+
+    def breakLines(self, width):
+        chave = tuple(width) if isinstance(width, (list, tuple)) else width
+        memo = self._quebras.get(chave)
+        if memo is None:
+            self.frags = self._frags_originais
+            blPara = Paragraph.breakLines(self, width)
+            # breakLines troca self.frags pela lista de palavras; guardamos as duas
+            memo = self._quebras[chave] = (blPara, self.frags)
+        self.frags = memo[1]
+        return memo[0]
+
+
+def _analisar(texto, estilo):
+    parser = ParaParser()
+    parser.caseSensitive = 1
+    estilo_final, frags, _ = parser.parse(cleanBlockQuotedText(texto), estilo)
+    if frags is None:
+        raise ValueError(f"xml parser error ({parser.errors[0]}) in '{texto[:30]}'")
+    textTransformFrags(frags, estilo_final)
+    return estilo_final, frags
+
+def paragrafo(texto: str, estilo) -> Paragraph:
+    """Paragraph de um texto FIXO, a partir do cache (analisa só na 1ª vez)."""
+    chave = (texto, estilo.name)
+    with _lock:
+        memo = _cache.get(chave)
+        _contador["hits" if memo is not None else "misses"] += 1
+    if memo is None:
+        estilo_final, frags = _analisar(texto, estilo)
+        memo = (estilo_final, frags, {})
+        with _lock:
+            if len(_cache) < MAX_ENTRADAS:
+                memo = _cache.setdefault(chave, memo)
+    estilo_final, frags, quebras = memo
+    return ParagrafoPreparado(texto, estilo_final, frags=frags, quebras=quebras)
+
+
+# ─── 2. BANCO DE TEXTOS ─────────────────────────────────────────
+# Chave de aspecto normalizada: (p1, p2, tipo) resolve nas duas ordens
+# com uma única consulta; a ordem escrita no banco tem precedência.
+_ASPECTOS = {}
+for _chave, _texto in TEXTOS_ASPECTOS.items():
+    _p1, _p2, _tipo = _chave.rsplit("-", 2)
+    _ASPECTOS[(_p1, _p2, _tipo)] = _texto
+for (_p1, _p2, _tipo), _texto in list(_ASPECTOS.items()):
+    _ASPECTOS.setdefault((_p2, _p1, _tipo), _texto)
+
+def texto_aspecto(p1_id: str, p2_id: str, tipo_en: str, padrao: str) -> str:
+    return _ASPECTOS.get((p1_id, p2_id, tipo_en), padrao)
+
+def preparar(estilo, padroes=()):
+    """Analisa de antemão todo o banco (e os textos padrão) no `estilo` dado."""
+    textos = [INTRO_METAFORA, COMO_LER, *TEXTO_SOL.values(), *TEXTO_LUA.values(),
+              *TEXTO_ASC.values(), *TEXTOS_ASPECTOS.values(), *padroes]
+    for texto in textos:
+        paragrafo(texto, estilo)
+
+
+# ─── 3. ESTATÍSTICAS ────────────────────────────────────────────
+def estatisticas() -> dict:
+    """Entradas, taxa de acerto e memória aproximada (bytes serializados)."""
+    with _lock:
+        entradas = list(_cache.values())
+        stats = dict(_contador)
+    stats["entradas"] = len(entradas)
+    stats["quebras_memorizadas"] = sum(len(q) for _, _, q in entradas)
+    consultas = stats["hits"] + stats["misses"]
+    stats["taxa_acerto"] = round(stats["hits"] / consultas, 4) if consultas else 0.0
+    try:
+        stats["bytes_aprox"] = sum(len(pickle.dumps((f, dict(q)))) for _, f, q in entradas)
+    except Exception:
+        stats["bytes_aprox"] = None
+    return stats
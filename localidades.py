@@ -0,0 +1,140 @@
+# localidades.py – gazetteer offline dos municípios brasileiros
+# =============================================================
+# Índice em memória (cidade, UF) -> latitude, longitude e fuso IANA,
+# carregado uma única vez de dados/municipios.csv (base GeoNames,
+# licença CC BY 4.0). O Nominatim fica apenas como fallback opcional,
+# com cache LRU para que a mesma cidade nunca vá à rede duas vezes; o
+# fuso de um resultado dele vem do município mais próximo da mesma UF.
+import os, csv, math, bisect, unicodedata
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+# ─── 1. CONFIGURAÇÃO ────────────────────────────────────────────
+BASE_DIR        = os.path.dirname(os.path.abspath(__file__))
+MUNICIPIOS_CSV  = os.path.join(BASE_DIR, "dados", "municipios.csv")
+FUSO_PADRAO     = "America/Sao_Paulo"
+
+# NOMINATIM_FALLBACK=0 desliga totalmente o acesso à rede
+NOMINATIM_FALLBACK = os.environ.get("NOMINATIM_FALLBACK", "1") != "0"
+NOMINATIM_CACHE    = int(os.environ.get("NOMINATIM_CACHE", "2048"))
+NOMINATIM_AGENTE   = "verba-astrologia-v4"
+
+NOME_UF = {
+    "acre": "AC", "alagoas": "AL", "amapa": "AP", "amazonas": "AM",
+    "bahia": "BA", "ceara": "CE", "distrito federal": "DF",
+    "espirito santo": "ES", "goias": "GO", "maranhao": "MA",
+    "mato grosso": "MT", "mato grosso do sul": "MS", "minas gerais": "MG",
+    "para": "PA", "paraiba": "PB", "parana": "PR", "pernambuco": "PE",
+    "piaui": "PI", "rio de janeiro": "RJ", "rio grande do norte": "RN",
+    "rio grande do sul": "RS", "rondonia": "RO", "roraima": "RR",
+    "santa catarina": "SC", "sao paulo": "SP", "sergipe": "SE",
+    "tocantins": "TO",
+}
+
+
+class Localidade(NamedTuple):
+    nome: str
+    uf: str
+    latitude: float
+    longitude: float
+    fuso: str
+    populacao: int = 0
+
+
+# ─── 2. NORMALIZAÇÃO ────────────────────────────────────────────
+def normalizar(texto: str) -> str:
+    """'  São  João d'El-Rei ' -> 'sao joao d el rei' (sem acento/caixa)."""
+    nfkd = unicodedata.normalize("NFKD", texto)
+    sem_acento = "".join(c for c in nfkd if not unicodedata.combining(c))
+    limpo = "".join(c if c.isalnum() else " " for c in sem_acento.lower())
+    return " ".join(limpo.split())
+
+def normalizar_uf(estado: str) -> str:
+    """Aceita 'SP', 'sp', 'São Paulo'; devolve a sigla ou '' se desconhecido."""
+    chave = normalizar(estado)
+    if len(chave) == 2 and chave.upper() in NOME_UF.values():
+        return chave.upper()
+    return NOME_UF.get(chave, "")
+
+
+# ─── 3. ÍNDICE EM MEMÓRIA ───────────────────────────────────────
+_exato  = {}   # (uf, nome_norm) -> Localidade
+_nomes  = {}   # uf -> lista ordenada de nome_norm (busca por prefixo)
+_todos  = {}   # nome_norm -> [Localidade, ...] (quando a UF não ajuda)
+
+def _carregar():
+    if _exato:
+        return
+    with open(MUNICIPIOS_CSV, encoding="utf-8", newline="") as f:
+        for linha in csv.DictReader(f):
+            loc = Localidade(linha["nome"], linha["uf"],
+                             float(linha["latitude"]), float(linha["longitude"]),
+                             linha["fuso"], int(linha["populacao"] or 0))
+            chave = normalizar(loc.nome)
+            atual = _exato.get((loc.uf, chave))
+            if atual is None or loc.populacao > atual.populacao:
+                _exato[(loc.uf, chave)] = loc
+    for (uf, chave), loc in _exato.items():
+        _nomes.setdefault(uf, []).append(chave)
+        _todos.setdefault(chave, []).append(loc)
+    for lista in _nomes.values():
+        lista.sort()
+
+def _por_prefixo(uf: str, prefixo: str) -> Optional[Localidade]:
+    nomes = _nomes.get(uf, [])
+    i = bisect.bisect_left(nomes, prefixo)
+    candidatos = []
+    while i < len(nomes) and nomes[i].startswith(prefixo):
+        candidatos.append(_exato[(uf, nomes[i])])
+        i += 1
+    # Prefixo ambíguo: fica com o município mais populoso
+    return max(candidatos, key=lambda l: l.populacao, default=None)
+
+def buscar(cidade: str, estado: str) -> Optional[Localidade]:
+    """Busca offline: exata e, se falhar, por prefixo. Nunca acessa a rede."""
+    _carregar()
+    chave, uf = normalizar(cidade), normalizar_uf(estado)
+    if not chave:
+        return None
+    if uf:
+        return _exato.get((uf, chave)) or _por_prefixo(uf, chave)
+    # UF não reconhecida: aceita o nome exato mais populoso do país
+    return max(_todos.get(chave, []), key=lambda l: l.populacao, default=None)
+
+def fuso_proximo(uf: str, latitude: float, longitude: float) -> str:
+    """
+    Fuso do município do gazetteer mais próximo de (latitude, longitude),
+    na mesma UF se ela for conhecida. AM, AC, MT, MS, RO, RR e o oeste do
+    PA não estão no horário de Brasília.
+    """
+    _carregar()
+    candidatos = [_exato[(uf, nome)] for nome in _nomes.get(uf, [])] or list(_exato.values())
+    escala = math.cos(math.radians(latitude)) ** 2
+    perto = min(candidatos, default=None,
+                key=lambda l: (l.latitude - latitude) ** 2 + escala * (l.longitude - longitude) ** 2)
+    return perto.fuso if perto is not None else FUSO_PADRAO
+
+
+# ─── 4. FALLBACK ONLINE (NOMINATIM) ─────────────────────────────
+_geocoder = None
+
+@lru_cache(maxsize=NOMINATIM_CACHE)
+def _nominatim(cidade_norm: str, uf: str) -> Optional[Localidade]:
+    global _geocoder
+    if _geocoder is None:
+        from geopy.geocoders import Nominatim
+        _geocoder = Nominatim(user_agent=NOMINATIM_AGENTE)
+    geo = _geocoder.geocode(f"{cidade_norm}, {uf}, Brasil")
+    if not geo:
+        return None
+    lat, lon = float(geo.latitude), float(geo.longitude)
+    return Localidade(cidade_norm, uf, lat, lon, fuso_proximo(uf, lat, lon))
+
+def localizar(cidade: str, estado: str) -> Localidade:
+    """Resolve (cidade, estado) offline; cai no Nominatim se habilitado."""
+    loc = buscar(cidade, estado)
+    if loc is None and NOMINATIM_FALLBACK:
+        loc = _nominatim(normalizar(cidade), normalizar_uf(estado) or normalizar(estado))
+    if loc is None:
+        raise ValueError("Localização não encontrada.")
+    return loc
@@ -0,0 +1,133 @@
+# lote.py – geração de mapas em lote (NDJSON em streaming)
+# =============================================================
+# Recebe nascimentos como linhas NDJSON (ou dicts), distribui o cálculo
+# entre os núcleos e devolve um resultado por entrada assim que cada um
+# termina. Só MAX_EM_VOO entradas ficam em memória ao mesmo tempo, então
+# o consumo é constante seja qual for o tamanho da entrada, e uma linha
+# ruim vira um resultado de erro sem interromper o lote.
+import os, json, zipfile, tempfile
+from concurrent.futures import wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+
+import processos
+from astrologia import gerar_mapa_astral
+
+# ─── 1. CONFIGURAÇÃO ────────────────────────────────────────────
+MAX_EM_VOO = int(os.environ.get("LOTE_MAX_EM_VOO", str(4 * processos.PROCESSOS)))
+
+CAMPOS = ["nome", "data", "hora", "cidade", "estado"]
+
+
+# ─── 2. TRABALHO POR LINHA ──────────────────────────────────────
+def _erro(indice, ident, mensagem):
+    return {"indice": indice, "id": ident, "sucesso": False, "erro": mensagem}
+
+def _ler_entrada(indice, entrada):
+    """Converte uma linha NDJSON (ou dict) em (id, args) ou num resultado de erro."""
+    if isinstance(entrada, (bytes, str)):
+        try:
+            entrada = json.loads(entrada)
+        except ValueError:
+            return None, _erro(indice, None, "JSON inválido")
+    if not isinstance(entrada, dict):
+        return None, _erro(indice, None, "Cada linha deve ser um objeto JSON")
+    ident = entrada.get("id")
+    if not all(isinstance(entrada.get(k), str) and entrada[k].strip() for k in CAMPOS):
+        return None, _erro(indice, ident, "Campos obrigatórios ausentes")
+    return (ident, [entrada[k].strip() for k in CAMPOS]), None
+
+def _calcular(indice, ident, args, com_pdf):
+    """Roda no pool: nunca levanta, sempre devolve um resultado."""
+    try:
+        mapa = gerar_mapa_astral(*args)
+        if mapa is None:
+            return _erro(indice, ident, "Falha ao gerar dados do mapa")
+        resultado = {"indice": indice, "id": ident, "sucesso": True, "mapa": mapa}
+        if com_pdf:
+            from pdf import criar_pdf_bytes, nome_arquivo_pdf   # só quando pedem PDF
+            resultado["pdf_bytes"] = criar_pdf_bytes(mapa)
+            resultado["filename"] = f"{indice:06d}_{nome_arquivo_pdf(mapa)}"
+        return resultado
+    except Exception as e:
+        return _erro(indice, ident, str(e) or e.__class__.__name__)
+
+
+# ─── 3. API PYTHON ──────────────────────────────────────────────
+def gerar_mapas_lote(entradas, com_pdf: bool = False, max_em_voo: int = None):
+    """
+    Gerador: para cada entrada (linha NDJSON, bytes ou dict) produz um
+    dict com `indice`, `id` (se informado), `sucesso` e `mapa` ou `erro`,
+    na ordem em que terminam. Com com_pdf=True inclui `pdf_bytes`. Se um
+    processo do pool morre, as linhas que estavam nele viram erro e o
+    lote segue num pool novo.
+    """
+    limite = max_em_voo or MAX_EM_VOO
+    em_voo = {}   # futuro -> (indice, id)
+    for indice, entrada in enumerate(entradas):
+        if isinstance(entrada, (bytes, str)) and not entrada.strip():
+            continue
+        tarefa, erro = _ler_entrada(indice, entrada)
+        if erro is not None:
+            yield erro
+            continue
+        em_voo[processos.submeter(_calcular, indice, *tarefa, com_pdf)] = (indice, tarefa[0])
+        if len(em_voo) >= limite:
+            yield from _colher(em_voo)
+    while em_voo:
+        yield from _colher(em_voo)
+
+def _colher(em_voo):
+    """Resultados dos futuros já prontos (tirados de `em_voo`)."""
+    prontos, _ = wait(em_voo, return_when=FIRST_COMPLETED)
+    for futuro in prontos:
+        indice, ident = em_voo.pop(futuro)
+        try:
+            yield futuro.result()
+        except BrokenProcessPool:
+            yield _erro(indice, ident, "Processo de cálculo interrompido")
+
+
+# ─── 4. SERIALIZAÇÃO ────────────────────────────────────────────
+def _linha_ndjson(resultado) -> bytes:
+    publico = {k: v for k, v in resultado.items() if k not in ("pdf_bytes", "filename")}
+    if "filename" in resultado:
+        publico["pdf"] = resultado["filename"]
+    return (json.dumps(publico, ensure_ascii=False) + "\n").encode("utf-8")
+
+def ndjson_stream(entradas):
+    """Uma linha NDJSON por entrada, à medida que ficam prontas."""
+    for resultado in gerar_mapas_lote(entradas):
+        yield _linha_ndjson(resultado)
+
+
+class _Saida:
+    """Arquivo só-escrita (não pesquisável) cujo conteúdo é drenado aos pedaços."""
+    def __init__(self):
+        self.partes = []
+    def write(self, dados):
+        self.partes.append(bytes(dados))
+        return len(dados)
+    def flush(self):
+        pass
+    def drenar(self) -> bytes:
+        dados, self.partes = b"".join(self.partes), []
+        return dados
+
+def zip_stream(entradas):
+    """
+    Zip em streaming: um PDF por mapa gerado e, ao final, resultados.ndjson
+    com todas as linhas (acumuladas num arquivo temporário, não na memória).
+    """
+    saida = _Saida()
+    with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as resultados:
+        with zipfile.ZipFile(saida, "w", compression=zipfile.ZIP_STORED) as zf:
+            for resultado in gerar_mapas_lote(entradas, com_pdf=True):
+                if resultado["sucesso"]:
+                    zf.writestr(resultado["filename"], resultado["pdf_bytes"])
+                resultados.write(_linha_ndjson(resultado))
+                yield saida.drenar()
+            resultados.seek(0)
+            with zf.open("resultados.ndjson", "w") as destino:
+                for bloco in iter(lambda: resultados.read(64 * 1024), b""):
+                    destino.write(bloco)
+        yield saida.drenar()
@@ -0,0 +1,306 @@
+# metricas.py – tempos por etapa, Server-Timing e /metrics (Prometheus)
+# =============================================================
+# `with etapa("geocodificacao"):` mede um trecho com perf_counter e
+#   1. soma a duração no histograma da etapa (sempre, por processo);
+#   2. se houver uma requisição em andamento (iniciar() no before_request),
+#      guarda o span para o cabeçalho Server-Timing da resposta.
+# Não registra nenhum dado do usuário, só nomes de etapa e durações. O
+# custo é um perf_counter, um lock e uma busca binária por etapa.
+import os, json, time, bisect, threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# ─── 1. CONFIGURAÇÃO ────────────────────────────────────────────
+PREFIXO   = os.environ.get("METRICAS_PREFIXO", "verba")
+DIRETORIO = os.environ.get("METRICAS_DIR", "")   # instantâneos por processo (seção 5)
+
+# Limites (segundos) dos baldes dos histogramas
+BALDES = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+          0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock  = threading.Lock()
+_spans = ContextVar("spans", default=None)
+
+
+# ─── 2. HISTOGRAMAS E CONTADORES ────────────────────────────────
+class Histograma:
+    """Histograma cumulativo no formato do Prometheus, por conjunto de rótulos."""
+
+    def __init__(self, nome, ajuda, rotulo):
+        self.nome, self.ajuda, self.rotulo = nome, ajuda, rotulo
+        self.series = {}   # valor do rótulo -> [contagens por balde..., soma, total]
+
+    def observar(self, valor_rotulo, segundos):
+        i = bisect.bisect_left(BALDES, segundos)
+        with _lock:
+            serie = self.series.get(valor_rotulo)
+            if serie is None:
+                serie = self.series[valor_rotulo] = [0] * (len(BALDES) + 2)
+            if i < len(BALDES):
+                serie[i] += 1
+            serie[-2] += segundos
+            serie[-1] += 1
+
+    def copiar(self):
+        with _lock:
+            return {k: list(v) for k, v in self.series.items()}
+
+    def exportar(self, series=None):
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} histogram"]
+        if series is None:
+            series = self.copiar()
+        for valor, serie in sorted(series.items()):
+            rot = f'{self.rotulo}="{valor}"'
+            acumulado = 0
+            for limite, n in zip(BALDES, serie):
+                acumulado += n
+                linhas.append(f'{self.nome}_bucket{{{rot},le="{limite}"}} {acumulado}')
+            linhas.append(f'{self.nome}_bucket{{{rot},le="+Inf"}} {serie[-1]}')
+            linhas.append(f"{self.nome}_sum{{{rot}}} {serie[-2]:.6f}")
+            linhas.append(f"{self.nome}_count{{{rot}}} {serie[-1]}")
+        return linhas
+
+
+class Contador:
+    """Contador monotônico por tupla de rótulos."""
+
+    def __init__(self, nome, ajuda, rotulos):
+        self.nome, self.ajuda, self.rotulos = nome, ajuda, rotulos
+        self.valores = {}
+
+    def incrementar(self, *valores_rotulos, n=1):
+        with _lock:
+            self.valores[valores_rotulos] = self.valores.get(valores_rotulos, 0) + n
+
+    def copiar(self):
+        with _lock:
+            return dict(self.valores)
+
+    def exportar(self, valores=None):
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} counter"]
+        if valores is None:
+            valores = self.copiar()
+        for chave, n in sorted(valores.items()):
+            rot = ",".join(f'{r}="{v}"' for r, v in zip(self.rotulos, chave))
+            linhas.append(f"{self.nome}{{{rot}}} {n}")
+        return linhas
+
+
+ETAPAS      = Histograma(f"{PREFIXO}_etapa_segundos", "Duração de cada etapa do mapa/PDF", "etapa")
+REQUISICOES = Histograma(f"{PREFIXO}_requisicao_segundos", "Duração das requisições HTTP por rota", "rota")
+RESPOSTAS   = Contador(f"{PREFIXO}_respostas_total", "Respostas HTTP por rota e status", ("rota", "status"))
+ERROS       = Contador(f"{PREFIXO}_erros_total", "Exceções por etapa", ("etapa",))
+
+# Estatísticas de outros módulos (caches etc.), lidas na hora da coleta
+_externos = []
+
+
+# ─── 3. SPANS ───────────────────────────────────────────────────
+def iniciar():
+    """Começa a coleta de spans da requisição atual."""
+    _spans.set([])
+
+def spans():
+    """Spans (nome, segundos) da requisição atual, na ordem em que terminaram."""
+    return _spans.get() or []
+
+def registrar(nome, segundos):
+    ETAPAS.observar(nome, segundos)
+    lista = _spans.get()
+    if lista is not None:
+        lista.append((nome, segundos))
+
+@contextmanager
+def etapa(nome):
+    """Mede o bloco; uma exceção conta em erros_total{etapa} e é repassada."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        ERROS.incrementar(nome)
+        raise
+    finally:
+        registrar(nome, time.perf_counter() - t0)
+
+def zerar():
+    """Descarta o que foi medido até aqui (ex.: o aquecimento antes do fork)."""
+    with _lock:
+        for metrica in (ETAPAS, REQUISICOES):
+            metrica.series.clear()
+        for metrica in (RESPOSTAS, ERROS):
+            metrica.valores.clear()
+
+def server_timing(extras=()) -> str:
+    """Valor do cabeçalho Server-Timing (durações em ms)."""
+    return ", ".join(f"{nome};dur={segundos * 1000:.2f}"
+                     for nome, segundos in [*spans(), *extras])
+
+
+# ─── 4. EXPORTAÇÃO ──────────────────────────────────────────────
+def registrar_estatisticas(nome, funcao, contadores=()):
+    """
+    Exporta as chaves numéricas de funcao() (um dict) como
+    <PREFIXO>_<nome>_<chave>; as chaves em `contadores` saem como counter
+    (com sufixo _total), as demais como gauge.
+    """
+    _externos.append((nome, funcao, frozenset(contadores)))
+
+def _valores_externos() -> dict:
+    """{métrica: (tipo, valor)} das estatísticas registradas."""
+    saida = {}
+    for nome, funcao, contadores in _externos:
+        try:
+            valores = funcao()
+        except Exception as e:
+            print(f"[AVISO metricas] estatísticas de {nome} falharam: {e}")
+            continue
+        for chave, valor in valores.items():
+            if isinstance(valor, bool) or not isinstance(valor, (int, float)):
+                continue
+            if chave in contadores:
+                saida[f"{PREFIXO}_{nome}_{chave}_total"] = ("counter", valor)
+            else:
+                saida[f"{PREFIXO}_{nome}_{chave}"] = ("gauge", valor)
+    return saida
+
+def _exportar_externos(valores) -> list:
+    """valores: {métrica: (tipo, valor ou {pid: valor})}."""
+    linhas = []
+    for metrica, (tipo, valor) in valores.items():
+        linhas.append(f"# TYPE {metrica} {tipo}")
+        if isinstance(valor, dict):
+            linhas += [f'{metrica}{{pid="{pid}"}} {v}' for pid, v in sorted(valor.items())]
+        else:
+            linhas.append(f"{metrica} {valor}")
+    return linhas
+
+def texto_prometheus() -> str:
+    """Todas as métricas no formato de texto do Prometheus (de todos os workers, se DIRETORIO)."""
+    if DIRETORIO:
+        return _texto_agregado()
+    linhas = [*ETAPAS.exportar(), *REQUISICOES.exportar(),
+              *RESPOSTAS.exportar(), *ERROS.exportar(),
+              *_exportar_externos(_valores_externos())]
+    return "\n".join(linhas) + "\n"
+
+
+# ─── 5. VÁRIOS PROCESSOS ────────────────────────────────────────
+# Com vários workers do gunicorn cada um tem os seus histogramas. Se
+# METRICAS_DIR estiver definido (o gunicorn.conf.py define), cada worker
+# grava um instantâneo em <DIRETORIO>/<pid>.json ao fim das requisições
+# (no máximo duas vezes por segundo) e o /metrics soma os de todos, como o modo multiprocesso do
+# prometheus_client: histogramas e contadores somados (os de workers que
+# já morreram ficam em mortos.json), gauges com um rótulo pid por worker
+# vivo.
+_MORTOS = "mortos.json"
+PERSISTIR_A_CADA = 0.5
+
+_lock_arquivo = threading.Lock()
+_ultima       = float("-inf")   # monotonic da última gravação
+_agendado     = False
+
+def _instantaneo() -> dict:
+    return {
+        "histogramas": {h.nome: h.copiar() for h in (ETAPAS, REQUISICOES)},
+        "contadores": {c.nome: [[list(k), n] for k, n in c.copiar().items()]
+                       for c in (RESPOSTAS, ERROS)},
+        "externos": {m: list(tv) for m, tv in _valores_externos().items()},
+    }
+
+def _gravar(caminho, dados):
+    temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporario, "w") as f:
+        json.dump(dados, f, separators=(",", ":"))
+    os.replace(temporario, caminho)
+
+def _ler(caminho):
+    try:
+        with open(caminho) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _persistir_agora():
+    global _ultima, _agendado
+    with _lock_arquivo:
+        _agendado, _ultima = False, time.monotonic()
+        try:
+            _gravar(os.path.join(DIRETORIO, f"{os.getpid()}.json"), _instantaneo())
+        except OSError as e:
+            print(f"[AVISO metricas] não foi possível gravar as métricas: {e}")
+
+def persistir(agora=False):
+    """
+    Grava o instantâneo deste processo (sem efeito fora do modo
+    multiprocesso). No máximo uma gravação a cada PERSISTIR_A_CADA
+    segundos: o que chega nesse intervalo sai numa gravação agendada.
+    """
+    global _agendado
+    if not DIRETORIO:
+        return
+    espera = _ultima + PERSISTIR_A_CADA - time.monotonic()
+    if agora or espera <= 0:
+        _persistir_agora()
+        return
+    with _lock_arquivo:
+        if _agendado:
+            return
+        _agendado = True
+    temporizador = threading.Timer(espera, _persistir_agora)
+    temporizador.daemon = True
+    temporizador.start()
+
+def _somar(total, dados, com_gauges, pid=None):
+    for nome, series in dados.get("histogramas", {}).items():
+        destino = total["histogramas"].setdefault(nome, {})
+        for rotulo, serie in series.items():
+            atual = destino.setdefault(rotulo, [0] * len(serie))
+            destino[rotulo] = [a + b for a, b in zip(atual, serie)]
+    for nome, pares in dados.get("contadores", {}).items():
+        destino = total["contadores"].setdefault(nome, {})
+        for chave, n in pares:
+            destino[tuple(chave)] = destino.get(tuple(chave), 0) + n
+    for metrica, (tipo, valor) in dados.get("externos", {}).items():
+        if tipo == "counter":
+            _, atual = total["externos"].get(metrica, (tipo, 0))
+            total["externos"][metrica] = (tipo, atual + valor)
+        elif com_gauges:
+            total["externos"].setdefault(metrica, (tipo, {}))[1][pid] = valor
+
+def recolher(pid: int):
+    """
+    Chamado no pai quando um worker sai (child_exit): soma os contadores
+    dele em mortos.json, para que não voltem para trás, e descarta os gauges.
+    """
+    if not DIRETORIO:
+        return
+    dados = _ler(os.path.join(DIRETORIO, f"{pid}.json"))
+    if dados is not None:
+        total = {"histogramas": {}, "contadores": {}, "externos": {}}
+        for anterior in (_ler(os.path.join(DIRETORIO, _MORTOS)), dados):
+            if anterior:
+                _somar(total, anterior, com_gauges=False)
+        total["contadores"] = {nome: [[list(k), n] for k, n in pares.items()]
+                               for nome, pares in total["contadores"].items()}
+        total["externos"] = {m: list(tv) for m, tv in total["externos"].items()}
+        _gravar(os.path.join(DIRETORIO, _MORTOS), total)
+    try:
+        os.remove(os.path.join(DIRETORIO, f"{pid}.json"))
+    except OSError:
+        pass
+
+def _texto_agregado() -> str:
+    persistir(agora=True)
+    total = {"histogramas": {}, "contadores": {}, "externos": {}}
+    for arquivo in sorted(os.listdir(DIRETORIO)):
+        if not arquivo.endswith(".json"):
+            continue
+        dados = _ler(os.path.join(DIRETORIO, arquivo))
+        if dados is not None:
+            _somar(total, dados, com_gauges=arquivo != _MORTOS, pid=arquivo[:-len(".json")])
+    linhas = [*ETAPAS.exportar(total["histogramas"].get(ETAPAS.nome, {})),
+              *REQUISICOES.exportar(total["histogramas"].get(REQUISICOES.nome, {})),
+              *RESPOSTAS.exportar(total["contadores"].get(RESPOSTAS.nome, {})),
+              *ERROS.exportar(total["contadores"].get(ERROS.nome, {})),
+              *_exportar_externos(total["externos"])]
+    return "\n".join(linhas) + "\n"
@@ -1,8 +1,12 @@
 # pdf.py – gerador de PDF com foco em design e clareza para leigos
 # =======================================================================
+import io
 import os
+import re
 import time
 import unicodedata
+from functools import lru_cache
+from PIL import Image as PILImage
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
 from reportlab.lib.units import cm
@@ -15,9 +19,12 @@ from flatlib import const
 
 # Importe os textos que você irá escrever
 from textos_astrologicos import (
-    INTRO_METAFORA, COMO_LER, TEXTO_SOL, TEXTO_LUA, TEXTO_ASC,
-    TEXTOS_ASPECTOS
+    INTRO_METAFORA, COMO_LER, TEXTO_SOL, TEXTO_LUA, TEXTO_ASC
 )
+# Textos fixos já analisados (markup e quebra de linhas) – ver interpretacoes.py
+from interpretacoes import paragrafo, texto_aspecto, preparar
+from metricas import etapa
+import roda
 
 # --- CONFIGURAÇÃO DE DESIGN ---
 COR_FUNDO = colors.HexColor("#0D1B2A")
@@ -26,6 +33,21 @@ COR_SUBTITULO_AZUL = colors.HexColor("#89CFF0")
 COR_TEXTO_BRANCO = colors.HexColor("#E2E8F0")
 COR_LEGENDA_CINZA = colors.HexColor("#A0AEC0")
 
+# --- ARQUIVOS E RETENÇÃO ---
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PDF_DIR = os.path.join(BASE_DIR, "pdfs")
+STATIC_DIR = os.path.join(BASE_DIR, "static")
+
+# Limites da pasta pdfs/ (só usada no modo em disco)
+RETENCAO_MAX_IDADE = float(os.environ.get("PDF_RETENCAO_HORAS", "24")) * 3600
+RETENCAO_MAX_BYTES = int(float(os.environ.get("PDF_RETENCAO_MB", "200")) * 1024 * 1024)
+
+# Imagens: reduzidas para esta resolução na área impressa e embutidas como JPEG
+IMAGENS_DPI = float(os.environ.get("PDF_IMAGENS_DPI", "150"))
+IMAGENS_QUALIDADE = int(os.environ.get("PDF_IMAGENS_QUALIDADE", "85"))
+TAMANHO_LOGO = 5 * cm    # logo da capa (quadrado)
+TAMANHO_ARTE = 15 * cm   # arte do signo solar (quadrado)
+
 # --- ESTILOS DE TEXTO ---
 styles = getSampleStyleSheet()
 styles.add(ParagraphStyle(name="CapaTitulo", fontSize=32, leading=40, textColor=COR_TITULO_OURO, alignment=TA_CENTER, fontName="Helvetica-Bold"))
@@ -36,14 +58,55 @@ styles.add(ParagraphStyle(name="CorpoTexto", fontSize=12, leading=18, textColor=
 styles.add(ParagraphStyle(name="Legenda", fontSize=9, leading=12, textColor=COR_LEGENDA_CINZA, alignment=TA_LEFT, spaceAfter=12))
 styles.add(ParagraphStyle(name="Link", fontSize=12, leading=18, textColor=COR_SUBTITULO_AZUL, alignment=TA_CENTER, spaceAfter=10))
 
+# --- TEXTOS PADRÃO (quando o banco não tem o signo/aspecto) ---
+PADRAO_SOL = "Sua essência solar."
+PADRAO_LUA = "Suas emoções profundas."
+PADRAO_ASC = "Sua forma de se mostrar ao mundo."
+PADRAO_ASPECTO = "Interação planetária única."
+preparar(styles["CorpoTexto"], (PADRAO_SOL, PADRAO_LUA, PADRAO_ASC, PADRAO_ASPECTO))
+
 
 # --- FUNÇÕES AUXILIARES ---
 def background_page(canvas, doc):
-    """Desenha o fundo azul escuro em todas as páginas."""
-    canvas.saveState()
-    canvas.setFillColor(COR_FUNDO)
-    canvas.rect(0, 0, A4[0], A4[1], fill=1, stroke=0)
-    canvas.restoreState()
+    """Desenha o fundo azul escuro em todas as páginas (um form XObject por documento)."""
+    if not canvas.hasForm("fundo"):
+        canvas.beginForm("fundo")
+        canvas.setFillColor(COR_FUNDO)
+        canvas.rect(0, 0, A4[0], A4[1], fill=1, stroke=0)
+        canvas.endForm()
+    canvas.doForm("fundo")
+
+@lru_cache(maxsize=32)
+def _jpeg_reduzido(caminho, largura_pt, altura_pt, mtime):
+    """
+    Abre a imagem uma vez por processo, aplica o canal alfa sobre COR_FUNDO
+    (o fundo é liso, o resultado é o mesmo), reduz para IMAGENS_DPI no
+    tamanho impresso e devolve os bytes JPEG, que o ReportLab embute sem
+    recodificar.
+    """
+    with PILImage.open(caminho) as original:
+        imagem = original.convert("RGBA")
+    fundo = PILImage.new("RGB", imagem.size, COR_FUNDO.bitmap_rgb())
+    fundo.paste(imagem, mask=imagem.getchannel("A"))
+    alvo = (max(1, round(largura_pt / 72 * IMAGENS_DPI)), max(1, round(altura_pt / 72 * IMAGENS_DPI)))
+    if alvo[0] < fundo.width or alvo[1] < fundo.height:
+        fundo = fundo.resize(alvo, PILImage.LANCZOS)
+    saida = io.BytesIO()
+    fundo.save(saida, "JPEG", quality=IMAGENS_QUALIDADE, optimize=True)
+    return saida.getvalue()
+
+def aquecer_imagens():
+    """Prepara de antemão o logo e todas as artes de signo (antes do fork)."""
+    for arquivo in sorted(os.listdir(STATIC_DIR)):
+        if arquivo.endswith(".png"):
+            lado = TAMANHO_LOGO if arquivo == "logo.png" else TAMANHO_ARTE
+            caminho = os.path.join(STATIC_DIR, arquivo)
+            _jpeg_reduzido(caminho, float(lado), float(lado), os.path.getmtime(caminho))
+
+def imagem_cache(caminho, largura, altura, **kwargs):
+    """Image da platypus a partir do JPEG reduzido em cache."""
+    dados = _jpeg_reduzido(caminho, float(largura), float(altura), os.path.getmtime(caminho))
+    return Image(io.BytesIO(dados), width=largura, height=altura, **kwargs)
 
 def normalizar_nome_signo(nome_signo):
     """Converte 'Áries' para 'aries', 'Sagitário' para 'sagitario', etc."""
@@ -52,17 +115,92 @@ def normalizar_nome_signo(nome_signo):
     nome_sem_acentos = "".join([c for c in nfkd_form if not unicodedata.combining(c)])
     return nome_sem_acentos.lower()
 
+def nome_arquivo_pdf(mapa: dict) -> str:
+    """'mapa_<nome>_<timestamp>.pdf', sem caracteres que escapem de pdfs/."""
+    nome = re.sub(r"[^\w-]", "_", mapa['nome'].strip())
+    return f"mapa_{nome}_{int(time.time())}.pdf"
+
+def limpar_pdfs(max_idade=RETENCAO_MAX_IDADE, max_bytes=RETENCAO_MAX_BYTES):
+    """Apaga de pdfs/ o que passou da idade e, depois, os mais antigos até caber no limite."""
+    try:
+        arquivos = [(e.stat().st_mtime, e.stat().st_size, e.path)
+                    for e in os.scandir(PDF_DIR) if e.is_file() and e.name.endswith(".pdf")]
+    except FileNotFoundError:
+        return
+    arquivos.sort()
+    agora = time.time()
+    total = sum(tamanho for _, tamanho, _ in arquivos)
+    for mtime, tamanho, caminho in arquivos:
+        if agora - mtime <= max_idade and total <= max_bytes:
+            break
+        try:
+            os.remove(caminho)
+        except FileNotFoundError:
+            pass
+        total -= tamanho
+
+LEGENDA_RODA = ("O céu no instante do seu nascimento. O Ascendente (AC) fica à esquerda; "
+                "os números no centro são as casas. Linhas azuis são aspectos fluidos "
+                "(trígono, sextil) e vermelhas, aspectos tensos (quadratura, oposição).")
+
+MESES_PT = ["Janeiro", "Fevereiro", "Março", "Abril", "Maio", "Junho", "Julho",
+            "Agosto", "Setembro", "Outubro", "Novembro", "Dezembro"]
+
+INTRO_TRANSITOS = ("Os planetas continuam andando depois do seu nascimento. Quando um deles "
+                   "forma um aspecto exato com um ponto do seu mapa, aquele tema ganha "
+                   "destaque. Abaixo estão as datas dos próximos encontros, mês a mês.")
+
+def _capitulo_transitos(eventos):
+    """Flowables do capítulo de trânsitos, agrupados por mês."""
+    partes = [paragrafo("Seu Ano à Frente: Trânsitos", styles["TituloCapitulo"]),
+              paragrafo(INTRO_TRANSITOS, styles["CorpoTexto"])]
+    mes_atual = None
+    for ev in eventos:
+        data = ev["data"]
+        if (data.year, data.month) != mes_atual:
+            mes_atual = (data.year, data.month)
+            partes.append(Paragraph(f"{MESES_PT[data.month - 1]} de {data.year}", styles["SubtituloPlaneta"]))
+        detalhes = []
+        if ev["retrogrado"]:
+            detalhes.append("retrógrado")
+        if ev["passagem"] > 1:
+            detalhes.append(f"{ev['passagem']}ª passagem")
+        sufixo = f" ({', '.join(detalhes)})" if detalhes else ""
+        partes.append(Paragraph(
+            f"<b>{data.day:02d}/{data.month:02d}</b> – {ev['transito_nome']} em "
+            f"{ev['tipo_pt']} com seu {ev['natal_nome']} natal{sufixo}", styles["CorpoTexto"]))
+    if mes_atual is None:
+        partes.append(paragrafo("Nenhum trânsito exato dos planetas lentos neste período.", styles["CorpoTexto"]))
+    return partes
+
 # --- FUNÇÃO PRINCIPAL DE CRIAÇÃO DO PDF ---
-def criar_pdf(mapa: dict) -> str:
-    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-    PDF_DIR = os.path.join(BASE_DIR, "pdfs")
-    STATIC_DIR = os.path.join(BASE_DIR, "static")
+def criar_pdf(mapa: dict, transitos=None) -> str:
+    """Gera o PDF em pdfs/ (aplicando a retenção) e devolve o caminho relativo."""
     os.makedirs(PDF_DIR, exist_ok=True)
+    path_pdf = os.path.join(PDF_DIR, nome_arquivo_pdf(mapa))
+    _construir_pdf(mapa, path_pdf, transitos)
+    limpar_pdfs()
+    return os.path.relpath(path_pdf, BASE_DIR)
 
-    filename = f"mapa_{mapa['nome'].replace(' ', '_')}_{int(time.time())}.pdf"
-    path_pdf = os.path.join(PDF_DIR, filename)
+def criar_pdf_bytes(mapa: dict, transitos=None) -> bytes:
+    """Gera o PDF inteiro em memória, sem tocar no disco."""
+    buffer = io.BytesIO()
+    _construir_pdf(mapa, buffer, transitos)
+    return buffer.getvalue()
 
-    doc = SimpleDocTemplate(path_pdf, pagesize=A4, leftMargin=2*cm, rightMargin=2*cm, topMargin=2*cm, bottomMargin=2*cm)
+def _construir_pdf(mapa: dict, destino, transitos=None):
+    """
+    Monta a story e grava em `destino` (caminho ou arquivo em memória).
+    `transitos` (eventos de transitos.transitos) acrescenta o capítulo do ano.
+    """
+    with etapa("pdf_story"):
+        doc, story = _montar_story(mapa, destino, transitos)
+    with etapa("pdf_build"):
+        doc.build(story, onFirstPage=background_page, onLaterPages=background_page)
+
+def _montar_story(mapa: dict, destino, transitos=None):
+    """Documento e lista de flowables do relatório."""
+    doc = SimpleDocTemplate(destino, pagesize=A4, leftMargin=2*cm, rightMargin=2*cm, topMargin=2*cm, bottomMargin=2*cm)
     
     story = []
     objetos = mapa["objetos"]
@@ -70,12 +208,12 @@ def criar_pdf(mapa: dict) -> str:
     # --- PÁGINA 1: CAPA ---
     logo_path = os.path.join(STATIC_DIR, "logo.png")
     if os.path.exists(logo_path):
-        story.append(Image(logo_path, width=5*cm, height=5*cm, hAlign='CENTER'))
+        story.append(imagem_cache(logo_path, TAMANHO_LOGO, TAMANHO_LOGO, hAlign='CENTER'))
         story.append(Spacer(1, 1 * cm))
     else:
         story.append(Spacer(1, 6 * cm))
 
-    story.append(Paragraph("Seu Mapa Astral", styles["CapaTitulo"]))
+    story.append(paragrafo("Seu Mapa Astral", styles["CapaTitulo"]))
     story.append(Spacer(1, 1 * cm))
     story.append(Paragraph(mapa["nome"], styles["CapaSubtitulo"]))
     story.append(Spacer(1, 0.5 * cm))
@@ -83,44 +221,54 @@ def criar_pdf(mapa: dict) -> str:
     story.append(PageBreak())
 
     # --- PÁGINA 2: INTRODUÇÃO ---
-    story.append(Paragraph("A Arquitetura da Sua Alma", styles["TituloCapitulo"]))
-    story.append(Paragraph(INTRO_METAFORA, styles["CorpoTexto"]))
+    story.append(paragrafo("A Arquitetura da Sua Alma", styles["TituloCapitulo"]))
+    story.append(paragrafo(INTRO_METAFORA, styles["CorpoTexto"]))
     story.append(Spacer(1, 0.5 * cm))
-    story.append(Paragraph(COMO_LER, styles["CorpoTexto"]))
+    story.append(paragrafo(COMO_LER, styles["CorpoTexto"]))
+    story.append(PageBreak())
+
+    # --- PÁGINA DA RODA NATAL ---
+    story.append(paragrafo("Sua Roda Natal", styles["TituloCapitulo"]))
+    story.append(paragrafo(LEGENDA_RODA, styles["Legenda"]))
+    story.append(roda.desenhar(mapa, roda.LADO))
     story.append(PageBreak())
 
     # --- PÁGINA 3: OS PILARES (BIG 3) ---
-    story.append(Paragraph("Os Pilares da Sua Identidade", styles["TituloCapitulo"]))
+    story.append(paragrafo("Os Pilares da Sua Identidade", styles["TituloCapitulo"]))
     
     sol = objetos[const.SUN]
     story.append(Paragraph(f"O Sol em {sol['signo_pt']}", styles["SubtituloPlaneta"]))
     if sol['casa'] > 0: story.append(Paragraph(f"Na Casa {sol['casa']}", styles["Legenda"]))
-    story.append(Paragraph(TEXTO_SOL.get(sol['signo_pt'], "Sua essência solar."), styles["CorpoTexto"]))
+    story.append(paragrafo(TEXTO_SOL.get(sol['signo_pt'], PADRAO_SOL), styles["CorpoTexto"]))
 
     lua = objetos[const.MOON]
     story.append(Paragraph(f"A Lua em {lua['signo_pt']}", styles["SubtituloPlaneta"]))
     if lua['casa'] > 0: story.append(Paragraph(f"Na Casa {lua['casa']}", styles["Legenda"]))
-    story.append(Paragraph(TEXTO_LUA.get(lua['signo_pt'], "Suas emoções profundas."), styles["CorpoTexto"]))
+    story.append(paragrafo(TEXTO_LUA.get(lua['signo_pt'], PADRAO_LUA), styles["CorpoTexto"]))
 
     asc = objetos[const.ASC]
     story.append(Paragraph(f"O Ascendente em {asc['signo_pt']}", styles["SubtituloPlaneta"]))
-    story.append(Paragraph(TEXTO_ASC.get(asc['signo_pt'], "Sua forma de se mostrar ao mundo."), styles["CorpoTexto"]))
+    story.append(paragrafo(TEXTO_ASC.get(asc['signo_pt'], PADRAO_ASC), styles["CorpoTexto"]))
     story.append(PageBreak())
 
     # --- PÁGINA 4: ASPECTOS PRINCIPAIS ---
-    story.append(Paragraph("A Trama da Sua Vida: Diálogos Internos", styles["TituloCapitulo"]))
+    story.append(paragrafo("A Trama da Sua Vida: Diálogos Internos", styles["TituloCapitulo"]))
     
     for asp in mapa["aspectos"]:
-        key = f"{asp['p1_id']}-{asp['p2_id']}-{asp['tipo_en']}"
-        texto_explicativo = TEXTOS_ASPECTOS.get(key, TEXTOS_ASPECTOS.get(f"{asp['p2_id']}-{asp['p1_id']}-{asp['tipo_en']}", "Interação planetária única."))
+        texto_explicativo = texto_aspecto(asp['p1_id'], asp['p2_id'], asp['tipo_en'], PADRAO_ASPECTO)
         
         story.append(Paragraph(f"{asp['p1_nome']} em {asp['tipo_pt']} com {asp['p2_nome']}", styles["SubtituloPlaneta"]))
         story.append(Paragraph(f"Orbe: {asp['orbe']}°", styles["Legenda"]))
-        story.append(Paragraph(texto_explicativo, styles["CorpoTexto"]))
+        story.append(paragrafo(texto_explicativo, styles["CorpoTexto"]))
     story.append(PageBreak())
 
+    # --- CAPÍTULO OPCIONAL: O ANO À FRENTE (TRÂNSITOS) ---
+    if transitos is not None:
+        story += _capitulo_transitos(transitos)
+        story.append(PageBreak())
+
     # --- PÁGINA FINAL: VENDA (DNA LUTINA) ---
-    story.append(Paragraph("Seu Quadro Solar Personalizado", styles["TituloCapitulo"]))
+    story.append(paragrafo("Seu Quadro Solar Personalizado", styles["TituloCapitulo"]))
     
     signo_solar_nome_pt = sol['signo_pt']
     signo_solar_norm = normalizar_nome_signo(signo_solar_nome_pt)
@@ -128,7 +276,7 @@ def criar_pdf(mapa: dict) -> str:
     imagem_path = os.path.join(STATIC_DIR, f"{signo_solar_norm}.png")
     
     if os.path.exists(imagem_path):
-        story.append(Image(imagem_path, width=15*cm, height=15*cm, hAlign='CENTER'))
+        story.append(imagem_cache(imagem_path, TAMANHO_ARTE, TAMANHO_ARTE, hAlign='CENTER'))
         story.append(Spacer(1, 0.5*cm))
     
     # URL FINAL: Fricção Zero para a Vercel
@@ -141,8 +289,6 @@ def criar_pdf(mapa: dict) -> str:
     story.append(Paragraph(texto_link, styles["Link"]))
 
     story.append(Spacer(1, 1.5*cm))
-    story.append(Paragraph("VERBA ART © | A Arte do Seu Destino", styles["Legenda"]))
+    story.append(paragrafo("VERBA ART © | A Arte do Seu Destino", styles["Legenda"]))
 
-    # Build
-    doc.build(story, onFirstPage=background_page, onLaterPages=background_page)
-    return os.path.relpath(path_pdf, BASE_DIR)
\ No newline at end of file
+    return doc, story
@@ -0,0 +1,43 @@
+# processos.py – pool de processos compartilhado (tarefas e lote)
+# =============================================================
+# Um único pool por processo do servidor, com PROCESSOS processos, para
+# a fila assíncrona e a geração em lote: com dois pools cada worker do
+# gunicorn teria o dobro de processos disputando os mesmos núcleos.
+# Os processos saem de um forkserver, nunca de um fork do servidor: o
+# pool nasce sob demanda com outras threads atendendo requisições, e um
+# fork herdaria locks (cache, métricas) travados. Um script próprio que
+# use o pool precisa do `if __name__ == "__main__":`. Se um processo do
+# pool morre (OOM, segfault) o executor fica quebrado para sempre; ele é
+# trocado por um novo na próxima chamada de pool().
+import os, threading, multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# ─── 1. CONFIGURAÇÃO ────────────────────────────────────────────
+PROCESSOS = int(os.environ.get("POOL_PROCESSOS", str(os.cpu_count() or 2)))
+
+_lock = threading.Lock()
+_pool = None
+
+
+# ─── 2. POOL ────────────────────────────────────────────────────
+def pool() -> ProcessPoolExecutor:
+    """O pool do processo, criado na primeira chamada e recriado se quebrou."""
+    global _pool
+    with _lock:
+        if _pool is not None and getattr(_pool, "_broken", False):
+            print("[AVISO processos] um processo do pool morreu; recriando o pool")
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+        if _pool is None:
+            contexto = multiprocessing.get_context("forkserver")
+            contexto.set_forkserver_preload(["astrologia"])
+            _pool = ProcessPoolExecutor(max_workers=PROCESSOS, mp_context=contexto)
+        return _pool
+
+def submeter(funcao, *args):
+    """pool().submit, com uma nova tentativa se o pool quebrar entre uma coisa e outra."""
+    try:
+        return pool().submit(funcao, *args)
+    except BrokenProcessPool:
+        return pool().submit(funcao, *args)
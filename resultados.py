@@ -0,0 +1,131 @@
+# resultados.py – mapa em JSON/MessagePack com ETag e PDF sob demanda
+# =============================================================
+# Para os front-ends que só precisam dos dados (sem PDF):
+#   1. os campos do nascimento são normalizados e viram um id (hash);
+#   2. o POST responde 303 para GET /api/mapa/dados/<id>; no GET, o ETag
+#      é o id + formato, então um If-None-Match igual responde 304 antes
+#      de qualquer consulta;
+#   3. o mapa calculado fica guardado por id (LRU do processo + SQLite
+#      compartilhado entre os workers), e o PDF pode ser pedido depois
+#      sobre o mesmo resultado (GET /api/mapa/dados/<id>/pdf), assim como
+#      a roda (GET /api/mapa/dados/<id>/roda.svg).
+import os, json, time, hashlib, threading
+from collections import OrderedDict
+
+import cache_mapas
+import compartilhado
+from astrologia import BACKEND_PADRAO, fmt_data, fmt_hora
+
+try:
+    import msgpack   # opcional: pip install msgpack
+except ImportError:
+    msgpack = None
+
+# ─── 1. CONFIGURAÇÃO ────────────────────────────────────────────
+MAX_RESULTADOS = int(os.environ.get("RESULTADOS_MAX", "1024"))
+VERSAO         = 2   # incremente quando o corpo da resposta mudar de formato
+
+CAMPOS = ["nome", "data", "hora", "cidade", "estado"]
+
+FORMATOS = {"json": "application/json", "msgpack": "application/msgpack"}
+_TIPOS    = {"application/json": "json", "application/msgpack": "msgpack",
+             "application/x-msgpack": "msgpack"}
+
+_lock       = threading.Lock()
+_resultados = OrderedDict()   # id -> mapa
+_gravacoes  = 0
+
+
+# ─── 2. ENTRADA NORMALIZADA E IDENTIFICADOR ─────────────────────
+def normalizar_entrada(dados) -> list:
+    """
+    [nome, data, hora, cidade, estado] normalizados (espaços, DD/MM/AAAA,
+    HH:MM, UF maiúscula) ou None se faltar campo. O corpo da resposta só
+    depende destes valores, o que mantém o ETag forte.
+    """
+    if not isinstance(dados, dict):
+        return None
+    valores = [dados.get(k) for k in CAMPOS]
+    if not all(isinstance(v, str) and v.strip() for v in valores):
+        return None
+    nome, data, hora, cidade, estado = (" ".join(v.split()) for v in valores)
+    return [nome, fmt_data(data), fmt_hora(hora), cidade, estado.upper()]
+
+def identificador(args) -> str:
+    """Hash da entrada normalizada e das versões que afetam o resultado."""
+    normalizado = json.dumps([VERSAO, cache_mapas.VERSAO, BACKEND_PADRAO, *args],
+                             ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(normalizado.encode()).hexdigest()[:32]
+
+def etag(ident: str, formato: str) -> str:
+    """ETag forte (sem aspas) de uma representação."""
+    return f"{ident}-{formato}"
+
+
+# ─── 3. FORMATO ─────────────────────────────────────────────────
+def escolher_formato(parametro, aceitos) -> str:
+    """
+    'json' ou 'msgpack' pelo ?formato= ou pelo Accept (`aceitos` é o
+    request.accept_mimetypes, com q-values); sem Accept, 'json'. None se
+    o pedido só aceita um formato indisponível.
+    """
+    if parametro:
+        formato = parametro
+    elif not aceitos:
+        formato = "json"
+    else:
+        ofertas = [t for t, f in _TIPOS.items() if f == "json" or msgpack is not None]
+        formato = _TIPOS.get(aceitos.best_match(ofertas))
+    if formato not in FORMATOS or (formato == "msgpack" and msgpack is None):
+        return None
+    return formato
+
+def serializar(corpo: dict, formato: str) -> bytes:
+    if formato == "msgpack":
+        return msgpack.packb(corpo, use_bin_type=True)
+    return json.dumps(corpo, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+# ─── 4. RESULTADOS POR ID ───────────────────────────────────────
+# Dois níveis: o LRU em memória do processo e a tabela `resultados` do
+# SQLite compartilhado, que qualquer worker lê. O mapa de um id nunca
+# muda, então os dois níveis não precisam de invalidação.
+def _lembrar(ident: str, mapa: dict):
+    with _lock:
+        _resultados[ident] = mapa
+        _resultados.move_to_end(ident)
+        while len(_resultados) > MAX_RESULTADOS:
+            _resultados.popitem(last=False)
+
+def guardar(ident: str, mapa: dict):
+    global _gravacoes
+    _lembrar(ident, mapa)
+    compartilhado.executar(
+        "INSERT OR REPLACE INTO resultados (id, valor, acesso) VALUES (?, ?, ?)",
+        (ident, json.dumps(mapa, ensure_ascii=False, separators=(",", ":")), time.time()))
+    with _lock:
+        _gravacoes += 1
+        despejar = _gravacoes % 64 == 0
+    if despejar:
+        compartilhado.executar(
+            "DELETE FROM resultados WHERE id NOT IN "
+            "(SELECT id FROM resultados ORDER BY acesso DESC LIMIT ?)", (MAX_RESULTADOS,))
+
+def obter(ident: str):
+    """Mapa já calculado para o id, ou None se nunca existiu ou foi despejado."""
+    with _lock:
+        mapa = _resultados.get(ident)
+        if mapa is not None:
+            _resultados.move_to_end(ident)
+            return mapa
+    linhas = compartilhado.consultar("SELECT valor FROM resultados WHERE id = ?", (ident,))
+    if not linhas:
+        return None
+    compartilhado.executar("UPDATE resultados SET acesso = ? WHERE id = ?", (time.time(), ident))
+    mapa = json.loads(linhas[0][0])
+    _lembrar(ident, mapa)
+    return mapa
+
+def estatisticas() -> dict:
+    with _lock:
+        return {"entradas": len(_resultados), "max": MAX_RESULTADOS}
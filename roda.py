@@ -0,0 +1,197 @@
+# roda.py – roda do mapa natal (vetorial: PDF e SVG)
+# =============================================================
+# A roda é montada em duas camadas:
+#   1. base: anel do zodíaco, divisões dos signos e as 360 marcas de grau,
+#      com 0° de Áries no eixo +x. As coordenadas ficam em cache por
+#      processo (tuplas, imutáveis); os objetos do ReportLab são novos a
+#      cada mapa, porque o render marca o Group durante o desenho e um
+#      Group compartilhado quebra com várias threads gerando PDFs;
+#   2. por mapa: a base entra girada para o Ascendente ficar à esquerda,
+#      e por cima vão os nomes dos signos (sempre na vertical), cúspides,
+#      números das casas, linhas de aspecto e os planetas, com os rótulos
+#      afastados uns dos outros quando caem muito perto.
+# O Drawing resultante vai direto para a story do PDF (vetorial) e é
+# exportado em SVG para a API.
+import math
+from functools import lru_cache
+
+from reportlab.lib import colors
+from reportlab.lib.units import cm
+from reportlab.graphics.shapes import Drawing, Group, Circle, Line, String, Rect, Path
+from reportlab.graphics import renderSVG
+from flatlib import const
+
+from astrologia import PONTOS_PARA_ASPECTOS
+
+# ─── 1. CONFIGURAÇÃO ────────────────────────────────────────────
+LADO = 15 * cm   # tamanho padrão (o mesmo da arte do signo no PDF)
+
+COR_FUNDO  = colors.HexColor("#0D1B2A")
+COR_ANEL   = colors.HexColor("#D4AF37")
+COR_TEXTO  = colors.HexColor("#E2E8F0")
+COR_FRACA  = colors.HexColor("#A0AEC0")
+COR_FLUIDO = colors.HexColor("#89CFF0")   # trígono, sextil
+COR_TENSO  = colors.HexColor("#E57373")   # quadratura, oposição
+
+# Raios como fração do lado
+R_EXTERNO  = 0.48
+R_SIGNOS   = 0.41    # borda interna do anel dos signos (onde saem as marcas)
+R_MARCADOR = 0.385   # posição exata do planeta
+R_ROTULO   = 0.345   # rótulo do planeta (pode ser deslocado)
+R_CASAS    = 0.29
+R_ASPECTOS = 0.22
+
+SEPARACAO_MIN = 10.0 # graus entre rótulos vizinhos
+
+SIGNOS_ABREV = ["Ári", "Tou", "Gêm", "Cân", "Leão", "Vir",
+                "Lib", "Esc", "Sag", "Cap", "Aqu", "Pei"]
+PONTOS_ABREV = {
+    const.SUN: "Sol", const.MOON: "Lua", const.MERCURY: "Mer", const.VENUS: "Vên",
+    const.MARS: "Mar", const.JUPITER: "Júp", const.SATURN: "Sat", const.URANUS: "Ura",
+    const.NEPTUNE: "Net", const.PLUTO: "Plu", const.NORTH_NODE: "Nód",
+    const.CHIRON: "Quí", const.ASC: "AC",
+}
+COR_ASPECTO = {"trine": COR_FLUIDO, "sextile": COR_FLUIDO,
+               "square": COR_TENSO, "opposition": COR_TENSO}
+
+
+# ─── 2. CAMADA BASE (CACHE) ─────────────────────────────────────
+def _ponto(raio, graus):
+    a = math.radians(graus)
+    return raio * math.cos(a), raio * math.sin(a)
+
+def _segmentos(pares):
+    """Pontos e operadores de um Path com um segmento (moveTo, lineTo) por par."""
+    pontos = []
+    for inicio, fim in pares:
+        pontos += [*inicio, *fim]
+    return tuple(pontos), (0, 1) * len(pares)
+
+@lru_cache(maxsize=8)
+def _geometria_base(lado: float):
+    """Coordenadas (tuplas) das divisões dos signos e das marcas de grau."""
+    divisoes = _segmentos([(_ponto(R_SIGNOS * lado, signo * 30), _ponto(R_EXTERNO * lado, signo * 30))
+                           for signo in range(12)])
+    marcas = []
+    for grau in range(360):
+        tamanho = 0.03 if grau % 10 == 0 else 0.02 if grau % 5 == 0 else 0.011
+        marcas.append((_ponto(R_SIGNOS * lado, grau), _ponto((R_SIGNOS - tamanho) * lado, grau)))
+    return divisoes, _segmentos(marcas)
+
+def _base(lado: float) -> Group:
+    """Anel do zodíaco e marcas de grau (Group novo), centrado em (0, 0), 0° Áries em +x."""
+    divisoes, marcas = _geometria_base(lado)
+    g = Group()
+    g.add(Circle(0, 0, R_EXTERNO * lado, fillColor=COR_FUNDO, strokeColor=COR_ANEL, strokeWidth=1.2))
+    g.add(Circle(0, 0, R_SIGNOS * lado, fillColor=None, strokeColor=COR_ANEL, strokeWidth=0.8))
+    g.add(Circle(0, 0, R_CASAS * lado, fillColor=None, strokeColor=COR_FRACA, strokeWidth=0.4))
+    g.add(Circle(0, 0, R_ASPECTOS * lado, fillColor=None, strokeColor=COR_FRACA, strokeWidth=0.4))
+    for (pontos, operadores), largura in ((divisoes, 0.8), (marcas, 0.3)):
+        g.add(Path(list(pontos), list(operadores), fillColor=None,
+                   strokeColor=COR_ANEL, strokeWidth=largura))
+    return g
+
+
+# ─── 3. CAMADA DO MAPA ──────────────────────────────────────────
+def espalhar(angulos, separacao=SEPARACAO_MIN, iteracoes=200):
+    """
+    Ângulos de rótulo próximos dos originais, com pelo menos `separacao`
+    graus entre vizinhos no círculo (a ordem é preservada).
+    """
+    n = len(angulos)
+    if n < 2:
+        return list(angulos)
+    separacao = min(separacao, 360.0 / n)
+    ordem = sorted(range(n), key=lambda i: angulos[i] % 360)
+    pos = [angulos[i] % 360 for i in ordem]
+    for _ in range(iteracoes):
+        mexeu = False
+        for k in range(n):
+            atual, prox = pos[k], pos[(k + 1) % n] + (360 if k == n - 1 else 0)
+            falta = separacao - (prox - atual)
+            if falta > 1e-6:
+                pos[k] -= falta / 2
+                pos[(k + 1) % n] += falta / 2
+                mexeu = True
+        if not mexeu:
+            break
+    resultado = [0.0] * n
+    for k, i in enumerate(ordem):
+        resultado[i] = pos[k] % 360
+    return resultado
+
+def _texto(x, y, texto, tamanho, cor=COR_TEXTO, fonte="Helvetica"):
+    # Centraliza vertical e horizontalmente em (x, y)
+    return String(x, y - tamanho * 0.35, texto, fontName=fonte, fontSize=tamanho,
+                  fillColor=cor, textAnchor="middle")
+
+def desenhar(mapa: dict, lado: float = LADO, fundo: bool = False) -> Drawing:
+    """Drawing da roda do `mapa` (dict de gerar_mapa_astral)."""
+    objetos = mapa["objetos"]
+    asc = objetos[const.ASC]["grau_completo"]
+    tela = lambda lon: 180.0 + lon - asc          # Ascendente à esquerda, sentido anti-horário
+    meio = lado / 2
+
+    d = Drawing(lado, lado)
+    d.hAlign = "CENTER"
+    if fundo:
+        d.add(Rect(0, 0, lado, lado, fillColor=COR_FUNDO, strokeColor=None))
+
+    base = _base(lado)
+    base.translate(meio, meio)
+    base.rotate(180.0 - asc)
+    d.add(base)
+
+    g = Group()
+    g.translate(meio, meio)
+    d.add(g)
+
+    # Signos
+    for signo, nome in enumerate(SIGNOS_ABREV):
+        g.add(_texto(*_ponto((R_SIGNOS + R_EXTERNO) / 2 * lado, tela(signo * 30 + 15)), nome,
+                     0.026 * lado, COR_ANEL, "Helvetica-Bold"))
+
+    # Cúspides e números das casas
+    cuspides = mapa.get("cuspides") or []
+    for i, cuspide in enumerate(cuspides):
+        angular = i in (0, 3, 6, 9)
+        g.add(Line(*_ponto(R_ASPECTOS * lado, tela(cuspide)), *_ponto(R_SIGNOS * lado, tela(cuspide)),
+                   strokeColor=COR_TEXTO if angular else COR_FRACA,
+                   strokeWidth=1.0 if angular else 0.4))
+        proxima = cuspides[(i + 1) % len(cuspides)]
+        centro = cuspide + ((proxima - cuspide) % 360) / 2
+        g.add(_texto(*_ponto((R_ASPECTOS + R_CASAS) / 2 * lado, tela(centro)), str(i + 1),
+                     0.022 * lado, COR_FRACA))
+
+    # Aspectos (conjunções não têm linha)
+    for asp in mapa["aspectos"]:
+        cor = COR_ASPECTO.get(asp["tipo_en"])
+        if cor is None:
+            continue
+        l1 = objetos[asp["p1_id"]]["grau_completo"]
+        l2 = objetos[asp["p2_id"]]["grau_completo"]
+        g.add(Line(*_ponto(R_ASPECTOS * lado, tela(l1)), *_ponto(R_ASPECTOS * lado, tela(l2)),
+                   strokeColor=cor, strokeWidth=0.7))
+
+    # Planetas: marcador na posição exata, rótulo afastado dos vizinhos
+    pontos = [p for p in PONTOS_PARA_ASPECTOS if p in objetos]
+    exatos = [tela(objetos[p]["grau_completo"]) for p in pontos]
+    rotulos = espalhar(exatos)
+    for pid, exato, rotulo in zip(pontos, exatos, rotulos):
+        obj = objetos[pid]
+        g.add(Circle(*_ponto(R_MARCADOR * lado, exato), 0.006 * lado,
+                     fillColor=COR_TEXTO, strokeColor=None))
+        g.add(Line(*_ponto(R_MARCADOR * lado, exato), *_ponto((R_ROTULO + 0.022) * lado, rotulo),
+                   strokeColor=COR_FRACA, strokeWidth=0.3))
+        x, y = _ponto(R_ROTULO * lado, rotulo)
+        g.add(_texto(x, y + 0.01 * lado, PONTOS_ABREV.get(pid, pid[:3]), 0.024 * lado,
+                     COR_TEXTO, "Helvetica-Bold"))
+        g.add(_texto(x, y - 0.014 * lado, f"{obj['grau'] % 30}°{obj['minuto']:02d}",
+                     0.017 * lado, COR_FRACA))
+    return d
+
+
+# ─── 4. EXPORTAÇÃO ──────────────────────────────────────────────
+def svg(mapa: dict, lado: float = LADO) -> bytes:
+    """Roda em SVG (com fundo)."""
+    return renderSVG.drawToString(desenhar(mapa, lado, fundo=True)).encode("utf-8")
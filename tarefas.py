@@ -0,0 +1,159 @@
+# tarefas.py – fila assíncrona de geração de PDFs
+# =============================================================
+# Modo assíncrono do /api/mapa: o POST devolve um id na hora e o pool
+# de processos (processos.py) roda gerar_mapa_astral + criar_pdf_bytes. O
+# cliente consulta o status (ou assina os eventos SSE) e baixa o PDF.
+# Quando a fila enche, enviar() levanta FilaCheia (o app responde 429).
+# Tarefas concluídas somem depois de TTL segundos. O estado fica no
+# SQLite compartilhado (compartilhado.py), visível de qualquer worker.
+import os, json, time, uuid
+
+import compartilhado
+import processos
+from astrologia import gerar_mapa_astral
+
+# ─── 1. CONFIGURAÇÃO ────────────────────────────────────────────
+FILA_MAX  = int(os.environ.get("TAREFAS_FILA_MAX", "32"))     # tarefas ainda não concluídas
+TTL       = float(os.environ.get("TAREFAS_TTL", "600"))       # segundos que o PDF fica disponível
+INTERVALO = 0.25                                              # consulta do status nos eventos SSE
+
+ETAPAS = ("fila", "mapa", "pdf", "total")
+
+
+class FilaCheia(Exception):
+    """A fila atingiu FILA_MAX tarefas pendentes."""
+
+
+# ─── 2. TRABALHO NO PROCESSO FILHO ──────────────────────────────
+def _executar(args, com_transitos=False):
+    """
+    Roda no pool: mapa (+ trânsitos do ano, se pedidos) e PDF. Devolve os
+    bytes e o tempo de cada etapa; os trânsitos contam na etapa "mapa".
+    """
+    from pdf import criar_pdf_bytes, nome_arquivo_pdf   # ReportLab só nos processos do pool
+    inicio = time.time()
+    t0 = time.perf_counter()
+    mapa = gerar_mapa_astral(*args)
+    if mapa is None:
+        raise ValueError("Falha ao gerar dados do mapa")
+    eventos = None
+    if com_transitos:
+        import transitos
+        eventos = transitos.proximos_12_meses(mapa)
+    t1 = time.perf_counter()
+    dados = criar_pdf_bytes(mapa, eventos)
+    t2 = time.perf_counter()
+    return {"inicio": inicio, "mapa": t1 - t0, "pdf": t2 - t1,
+            "pdf_bytes": dados, "filename": nome_arquivo_pdf(mapa)}
+
+
+# ─── 3. CONTROLE NO PROCESSO PRINCIPAL ──────────────────────────
+# As tarefas ficam no SQLite compartilhado (compartilhado.py): o worker que
+# recebeu o POST grava o resultado, e o polling, os eventos e o download
+# podem cair em qualquer outro. Uma tarefa que passou de TTL (concluída,
+# ou pendente de um worker que morreu) deixa de existir.
+_CAMPOS = "id, status, criada, fim, erro, tempos, filename"
+
+def _tarefa(linha) -> dict:
+    tid, st, criada, fim, erro, tempos, filename = linha
+    return {"id": tid, "status": st, "criada": criada, "fim": fim, "erro": erro,
+            "tempos": json.loads(tempos), "filename": filename}
+
+def _registrar_tempos(tempos):
+    for etapa, segundos in tempos.items():
+        compartilhado.executar(
+            "INSERT INTO tarefas_tempos (etapa, n, soma, max) VALUES (?, 1, ?, ?) "
+            "ON CONFLICT(etapa) DO UPDATE SET n = n + 1, soma = soma + excluded.soma, "
+            "max = MAX(max, excluded.max)", (etapa, segundos, segundos))
+
+def _concluir(tid, criada, futuro):
+    agora = time.time()
+    erro = futuro.exception()
+    if erro is not None:
+        compartilhado.executar("UPDATE tarefas SET status = 'erro', fim = ?, erro = ? WHERE id = ?",
+                        (agora, str(erro) or erro.__class__.__name__, tid))
+        return
+    res = futuro.result()
+    tempos = {"fila": max(0.0, res["inicio"] - criada),
+              "mapa": res["mapa"], "pdf": res["pdf"], "total": agora - criada}
+    compartilhado.executar(
+        "UPDATE tarefas SET status = 'concluida', fim = ?, tempos = ?, filename = ?, pdf = ? "
+        "WHERE id = ?", (agora, json.dumps(tempos), res["filename"], res["pdf_bytes"], tid))
+    _registrar_tempos(tempos)
+
+def _limite() -> float:
+    return time.time() - TTL
+
+def pendentes() -> int:
+    return compartilhado.consultar(
+        "SELECT COUNT(*) FROM tarefas WHERE status = 'pendente' AND criada >= ?",
+        (_limite(),))[0][0]
+
+def enviar(nome, data, hora, cidade, estado, com_transitos=False) -> str:
+    """
+    Enfileira uma tarefa e devolve o id; levanta FilaCheia se não houver
+    vaga. com_transitos=True inclui o capítulo do ano, como no modo síncrono.
+    A vaga é conferida e ocupada num único INSERT, atômico entre workers.
+    """
+    limite = _limite()
+    compartilhado.executar("DELETE FROM tarefas WHERE COALESCE(fim, criada) < ?", (limite,))
+    tid, criada = uuid.uuid4().hex, time.time()
+    inseridas = compartilhado.executar(
+        "INSERT INTO tarefas (id, status, criada) SELECT ?, 'pendente', ? WHERE "
+        "(SELECT COUNT(*) FROM tarefas WHERE status = 'pendente' AND criada >= ?) < ?",
+        (tid, criada, limite, FILA_MAX))
+    if not inseridas:
+        raise FilaCheia()
+    try:
+        futuro = processos.submeter(_executar, (nome, data, hora, cidade, estado), com_transitos)
+    except Exception:
+        compartilhado.executar("DELETE FROM tarefas WHERE id = ?", (tid,))
+        raise
+    futuro.add_done_callback(lambda f: _concluir(tid, criada, f))
+    return tid
+
+def obter(tid: str):
+    """Tarefa pelo id (sem o PDF), ou None se não existe ou já expirou."""
+    linhas = compartilhado.consultar(
+        f"SELECT {_CAMPOS} FROM tarefas WHERE id = ? AND COALESCE(fim, criada) >= ?",
+        (tid, _limite()))
+    return _tarefa(linhas[0]) if linhas else None
+
+def pdf(tid: str):
+    """Bytes do PDF de uma tarefa concluída, ou None."""
+    linhas = compartilhado.consultar(
+        "SELECT pdf FROM tarefas WHERE id = ? AND status = 'concluida' AND fim >= ?",
+        (tid, _limite()))
+    return bytes(linhas[0][0]) if linhas else None
+
+def status(tarefa: dict) -> dict:
+    """Visão pública (JSON) de uma tarefa."""
+    return {"id": tarefa["id"], "status": tarefa["status"], "erro": tarefa["erro"],
+            "tempos": {k: round(v, 4) for k, v in tarefa["tempos"].items()}}
+
+def aguardar(tid: str, timeout: float):
+    """
+    Espera até `timeout` segundos pelo fim da tarefa, consultando o estado
+    a cada INTERVALO (ela pode rodar em outro worker). Devolve a tarefa se
+    terminou ou sumiu (None), ou False se o tempo acabou.
+    """
+    fim = time.monotonic() + timeout
+    while True:
+        tarefa = obter(tid)
+        if tarefa is None or tarefa["status"] != "pendente":
+            return tarefa
+        if time.monotonic() >= fim:
+            return False
+        time.sleep(min(INTERVALO, max(0.0, fim - time.monotonic())))
+
+def estatisticas() -> dict:
+    """Profundidade da fila e latência por etapa (média e máxima, em segundos)."""
+    tempos = {etapa: (n, soma, maximo) for etapa, n, soma, maximo
+              in compartilhado.consultar("SELECT etapa, n, soma, max FROM tarefas_tempos")}
+    etapas = {}
+    for etapa in ETAPAS:
+        n, soma, maximo = tempos.get(etapa, (0, 0.0, 0.0))
+        etapas[etapa] = {"n": n, "media": round(soma / n, 4) if n else 0.0,
+                         "max": round(maximo, 4)}
+    return {"pendentes": pendentes(), "fila_max": FILA_MAX,
+            "processos": processos.PROCESSOS, "etapas": etapas}
@@ -0,0 +1,4 @@
+# conftest.py – os módulos do app ficam na raiz do repositório
+import os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
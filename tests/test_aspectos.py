@@ -0,0 +1,83 @@
+# test_aspectos.py – motor vetorizado x laço duplo original do flatlib
+# =============================================================
+# A referência é o laço de antes do aspectos.py: getAspect em cada par de
+# PONTOS_PARA_ASPECTOS e o filtro de orbe 5 (Sol/Lua) ou 3 (demais).
+import random
+
+import numpy as np
+import pytest
+from flatlib import aspects
+from flatlib.chart import Chart
+from flatlib.datetime import Datetime
+from flatlib.geopos import GeoPos
+
+import astrologia
+from astrologia import (PONTOS_PARA_ASPECTOS, CORPOS_PARA_CALCULO, ANGULOS, const,
+                        ANGULO_PARA_NOME_EN, ID_PARA_PT, TIPO_ASPECTO_PT)
+
+N_MAPAS = 3000
+
+
+def _aspectos_flatlib(objs):
+    aspectos_exp = []
+    for i, p1_id in enumerate(PONTOS_PARA_ASPECTOS):
+        for k, p2_id in enumerate(PONTOS_PARA_ASPECTOS[i + 1:], i + 1):
+            orbe_max = 5 if p1_id in [const.SUN, const.MOON] or p2_id in [const.SUN, const.MOON] else 3
+            aspecto = aspects.getAspect(objs[i], objs[k], ANGULOS)
+            if aspecto and abs(aspecto.orb) <= orbe_max:
+                tipo_en_lower = ANGULO_PARA_NOME_EN.get(aspecto.type, "")
+                if not tipo_en_lower:
+                    continue
+                aspectos_exp.append({
+                    "p1_id": p1_id, "p2_id": p2_id,
+                    "p1_nome": ID_PARA_PT.get(p1_id, p1_id),
+                    "p2_nome": ID_PARA_PT.get(p2_id, p2_id),
+                    "tipo_en": tipo_en_lower,
+                    "tipo_pt": TIPO_ASPECTO_PT.get(tipo_en_lower, tipo_en_lower.capitalize()),
+                    "orbe": round(aspecto.orb, 2)
+                })
+    return aspectos_exp
+
+def _objetos_aleatorios(r):
+    chart = Chart(
+        Datetime(f"{r.randint(1900, 2099)}/{r.randint(1, 12):02d}/{r.randint(1, 28):02d}",
+                 f"{r.randint(0, 23):02d}:{r.randint(0, 59):02d}", "+00:00"),
+        GeoPos(r.uniform(-55, 60), r.uniform(-180, 180)),
+        IDs=CORPOS_PARA_CALCULO, hsys=astrologia.SISTEMA_CASAS)
+    return [chart.get(pid) for pid in PONTOS_PARA_ASPECTOS]
+
+def _lons_vels(objs):
+    return [o.lon for o in objs], [getattr(o, "lonspeed", 0.0) for o in objs]
+
+
+@pytest.fixture(scope="module")
+def mapas():
+    r = random.Random(20261018)
+    return [_objetos_aleatorios(r) for _ in range(N_MAPAS)]
+
+
+def test_mapas_aleatorios(mapas):
+    for objs in mapas:
+        assert astrologia.calcular_aspectos(*_lons_vels(objs)) == _aspectos_flatlib(objs)
+
+def test_lote_empilhado(mapas):
+    lons = np.array([_lons_vels(objs)[0] for objs in mapas])
+    vels = np.array([_lons_vels(objs)[1] for objs in mapas])
+    lote = astrologia.calcular_aspectos_lote(lons, vels)
+    assert len(lote) == len(mapas)
+    for aspectos_mapa, objs in zip(lote, mapas):
+        assert aspectos_mapa == _aspectos_flatlib(objs)
+
+def test_perto_dos_limites_de_orbe():
+    """Pontos postos a ângulo ± orbe de outro, para cair nas bordas dos orbes."""
+    r = random.Random(7)
+    for _ in range(N_MAPAS):
+        objs = _objetos_aleatorios(r)
+        base = objs[0].lon
+        for obj in objs[1:]:
+            alvo = base + r.choice(ANGULOS) * r.choice((-1, 1))
+            obj.lon = (alvo + r.choice((-1, 1)) * r.choice((0.0, 2.99, 3.0, 3.01, 4.99, 5.0,
+                                                             5.01, 12.0, r.uniform(0, 15)))) % 360
+            if obj.id in CORPOS_PARA_CALCULO:
+                obj.lonspeed = r.choice((obj.lonspeed, -obj.lonspeed, objs[0].lonspeed))
+        assert astrologia.calcular_aspectos(*_lons_vels(objs)) == _aspectos_flatlib(objs)
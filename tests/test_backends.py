@@ -0,0 +1,36 @@
+# test_backends.py – backend swisseph direto x Chart do flatlib
+# =============================================================
+import random
+from datetime import datetime
+
+import astrologia
+
+N_MAPAS = 1000
+ARCO_MINUTO = 1 / 60
+
+
+def _instantes():
+    r = random.Random(3)
+    for _ in range(N_MAPAS):
+        yield (datetime(r.randint(1900, 2099), r.randint(1, 12), r.randint(1, 28),
+                        r.randint(0, 23), r.randint(0, 59)),
+               r.uniform(-55, 60), r.uniform(-180, 180))
+
+def _diferenca(a, b):
+    return abs((a - b + 180) % 360 - 180)
+
+
+def test_swisseph_igual_ao_flatlib():
+    """Longitudes e cúspides a menos de 1′; casas e aspectos idênticos."""
+    for dt_utc, lat, lon in _instantes():
+        caso = f"{dt_utc} {lat:.4f} {lon:.4f}"
+        lons_f, vels_f, casas_f, cusp_f = astrologia._posicoes_flatlib(dt_utc, lat, lon)
+        lons_s, vels_s, casas_s, cusp_s = astrologia._posicoes_swisseph(dt_utc, lat, lon)
+
+        for pid, a, b in zip(astrologia.PONTOS_PARA_ASPECTOS, lons_f, lons_s):
+            assert _diferenca(a, b) < ARCO_MINUTO, f"{pid} {caso}"
+        for a, b in zip(cusp_f, cusp_s):
+            assert _diferenca(a, b) < ARCO_MINUTO, caso
+        assert casas_s == casas_f, caso
+        assert (astrologia.calcular_aspectos(lons_s, vels_s)
+                == astrologia.calcular_aspectos(lons_f, vels_f)), caso
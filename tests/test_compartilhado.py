@@ -0,0 +1,84 @@
+# test_compartilhado.py – tarefas, resultados e /metrics entre workers
+# =============================================================
+# Com vários workers do gunicorn, quem consulta não é quem criou: outro
+# processo precisa ver a tarefa, o resultado e os contadores.
+import os, sys, json, time, subprocess
+
+import pytest
+
+import compartilhado
+import metricas
+import resultados
+import tarefas
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ARGS = ("Ana", "10/08/1990", "14:30", "São Paulo", "SP")
+
+
+@pytest.fixture
+def banco(tmp_path, monkeypatch):
+    caminho = str(tmp_path / "estado.sqlite3")
+    monkeypatch.setattr(compartilhado, "CAMINHO", caminho)
+    monkeypatch.setattr(compartilhado, "_conexao", None)
+    return caminho
+
+
+def _em_outro_processo(caminho, codigo):
+    env = dict(os.environ, ESTADO_DB=caminho, PYTHONPATH=RAIZ, AQUECER="0")
+    saida = subprocess.run([sys.executable, "-c", codigo], env=env, cwd=RAIZ,
+                           capture_output=True, text=True, timeout=120, check=True)
+    return json.loads(saida.stdout.strip().splitlines()[-1])
+
+
+def test_tarefa_vista_por_outro_processo(banco):
+    tid = tarefas.enviar(*ARGS)
+    visto = _em_outro_processo(banco, (
+        "import json, tarefas\n"
+        f"t = tarefas.aguardar({tid!r}, 120)\n"
+        f"print(json.dumps([t['status'], len(tarefas.pdf({tid!r}) or b'')]))"))
+    assert visto[0] == "concluida" and visto[1] > 1000
+    assert tarefas.obter(tid)["tempos"]["total"] > 0
+
+
+def test_fila_cheia_conta_todos_os_processos(banco, monkeypatch):
+    monkeypatch.setattr(tarefas, "FILA_MAX", 1)
+    compartilhado.executar("INSERT INTO tarefas (id, status, criada) VALUES ('x', 'pendente', ?)",
+                           (time.time(),))
+    with pytest.raises(tarefas.FilaCheia):
+        tarefas.enviar(*ARGS)
+
+
+def test_resultado_visto_por_outro_processo(banco):
+    mapa = {"objetos": [{"nome": "Sol", "lon": 137.5}], "aspectos": []}
+    resultados.guardar("abc", mapa)
+    assert _em_outro_processo(banco, (
+        "import json, resultados\n"
+        "print(json.dumps(resultados.obter('abc')))")) == mapa
+
+
+def test_metricas_somadas_entre_workers(tmp_path, monkeypatch):
+    monkeypatch.setattr(metricas, "DIRETORIO", str(tmp_path))
+    monkeypatch.setattr(metricas, "_externos", [("fila", lambda: {"pendentes": 2, "hits": 5},
+                                                  frozenset({"hits"}))])
+    metricas.zerar()
+    metricas.RESPOSTAS.incrementar("/x", "200", n=3)
+    metricas.REQUISICOES.observar("/x", 0.01)
+    metricas.persistir(agora=True)
+    # outro worker, com os mesmos números
+    with open(tmp_path / f"{os.getpid()}.json") as f:
+        outro = f.read()
+    (tmp_path / "1.json").write_text(outro)
+
+    texto = metricas.texto_prometheus()
+    assert 'verba_respostas_total{rota="/x",status="200"} 6' in texto
+    assert 'verba_requisicao_segundos_count{rota="/x"} 2' in texto
+    assert "verba_fila_hits_total 10" in texto
+    assert 'verba_fila_pendentes{pid="1"} 2' in texto
+
+    # o worker 1 sai: os contadores ficam, o gauge dele some
+    metricas.recolher(1)
+    texto = metricas.texto_prometheus()
+    assert 'verba_respostas_total{rota="/x",status="200"} 6' in texto
+    assert "verba_fila_hits_total 10" in texto
+    assert 'pid="1"' not in texto
+    metricas.zerar()
@@ -0,0 +1,52 @@
+# test_dados.py – POST /api/mapa/dados → 303 → GET com ETag/304
+# =============================================================
+# 304 só existe para GET/HEAD (RFC 9110 §13.1.2): o POST só cria o
+# resultado, e o ETag, o 304 e o Vary ficam no GET do Location.
+import pytest
+
+import compartilhado
+import resultados
+
+NASCIMENTO = {"nome": "Ana", "data": "10/08/1990", "hora": "14:30",
+              "cidade": "São Paulo", "estado": "SP"}
+
+
+@pytest.fixture
+def cliente(tmp_path, monkeypatch):
+    monkeypatch.setattr(compartilhado, "CAMINHO", str(tmp_path / "estado.sqlite3"))
+    monkeypatch.setattr(compartilhado, "_conexao", None)
+    from app import app
+    return app.test_client()
+
+
+def test_post_redireciona_e_get_revalida(cliente):
+    post = cliente.post("/api/mapa/dados", json=NASCIMENTO, headers={"If-None-Match": "*"})
+    assert post.status_code == 303
+    local = post.headers["Location"]
+    assert local == f"/api/mapa/dados/{post.get_json()['id']}"
+    assert "Ana" not in local and "1990" not in local
+
+    get = cliente.get(local)
+    assert get.status_code == 200
+    assert get.headers["Vary"] == "Accept"
+    assert get.get_json()["mapa"]["objetos"]
+    etag = get.headers["ETag"]
+
+    revalidado = cliente.get(local, headers={"If-None-Match": etag})
+    assert revalidado.status_code == 304 and revalidado.headers["ETag"] == etag
+
+
+def test_formato_e_erros(cliente):
+    msgpack = pytest.importorskip("msgpack")
+    post = cliente.post("/api/mapa/dados?formato=msgpack", json=NASCIMENTO)
+    assert post.status_code == 303 and post.headers["Location"].endswith("?formato=msgpack")
+    get = cliente.get(post.headers["Location"])
+    assert get.mimetype == "application/msgpack"
+    assert msgpack.unpackb(get.data)["id"] == post.get_json()["id"]
+
+    local = post.headers["Location"].split("?")[0]
+    assert cliente.get(local, headers={"Accept": "application/msgpack"}).mimetype == "application/msgpack"
+    recusado = {"Accept": "application/json;q=0, application/msgpack;q=0, text/html"}
+    assert cliente.get(local, headers=recusado).status_code == 406
+    assert cliente.get("/api/mapa/dados/" + "0" * 32).status_code == 404
+    assert cliente.post("/api/mapa/dados", json={"nome": "Ana"}).status_code == 400
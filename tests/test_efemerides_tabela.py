@@ -0,0 +1,58 @@
+# test_efemerides_tabela.py – tabela de Chebyshev x swe.calc_ut
+# =============================================================
+# O arquivo .bin é gerado (python efemerides_tabela.py gerar) e não vai
+# para o repositório: sem ele os testes são pulados.
+import random
+from datetime import datetime
+
+import numpy as np
+import pytest
+import swisseph as swe
+
+import astrologia
+import efemerides_tabela
+
+LIMITE_ARCSEC = 0.1     # a geração confere 0,05"
+LIMITE_VEL    = 1e-3    # graus/dia
+
+TABELA = efemerides_tabela.carregar()
+pytestmark = pytest.mark.skipif(TABELA is None, reason="tabela de efemérides não gerada")
+
+
+def _erro_arcsec(a, b):
+    return np.abs((np.asarray(a) - np.asarray(b) + 180.0) % 360.0 - 180.0) * 3600.0
+
+
+@pytest.mark.parametrize("pid", list(efemerides_tabela.SEGMENTOS))
+def test_posicao_igual_a_calc_ut(pid):
+    codigo = efemerides_tabela.SEGMENTOS[pid][0]
+    jds = np.random.default_rng(11).uniform(TABELA["jd_inicio"], TABELA["jd_fim"], 2000)
+    lon, vel = efemerides_tabela.posicao(TABELA, pid, jds)
+    ref = np.array([swe.calc_ut(float(jd), codigo)[0] for jd in jds])
+    assert _erro_arcsec(lon, ref[:, 0]).max() < LIMITE_ARCSEC
+    assert np.abs(vel - ref[:, 3]).max() < LIMITE_VEL
+
+    for jd, l, v in zip(jds[:200], lon, vel):
+        lon_e, vel_e = efemerides_tabela.posicao_escalar(TABELA, pid, float(jd))
+        assert _erro_arcsec(lon_e, l) < 1e-6 and abs(vel_e - v) < 1e-9
+
+def test_backend_tabela_igual_ao_swisseph():
+    """Longitudes a menos de 0,1"; mesmas cúspides, casas e aspectos."""
+    r = random.Random(8)
+    for _ in range(500):
+        dt_utc = datetime(r.randint(1900, 2099), r.randint(1, 12), r.randint(1, 28),
+                          r.randint(0, 23), r.randint(0, 59))
+        lat, lon = r.uniform(-55, 60), r.uniform(-180, 180)
+        caso = f"{dt_utc} {lat:.4f} {lon:.4f}"
+        lons_t, vels_t, casas_t, cusp_t = astrologia._posicoes_tabela(dt_utc, lat, lon)
+        lons_s, vels_s, casas_s, cusp_s = astrologia._posicoes_swisseph(dt_utc, lat, lon)
+
+        assert _erro_arcsec(lons_t, lons_s).max() < LIMITE_ARCSEC, caso
+        assert cusp_t == cusp_s, caso
+        assert casas_t == casas_s, caso
+        asp_t = astrologia.calcular_aspectos(lons_t, vels_t)
+        asp_s = astrologia.calcular_aspectos(lons_s, vels_s)
+        # O orbe sai arredondado a 0,01°: 0,1" pode virar o último dígito
+        assert [(a["p1_id"], a["p2_id"], a["tipo_en"]) for a in asp_t] == \
+               [(a["p1_id"], a["p2_id"], a["tipo_en"]) for a in asp_s], caso
+        assert all(abs(a["orbe"] - b["orbe"]) <= 0.01 + 1e-9 for a, b in zip(asp_t, asp_s)), caso
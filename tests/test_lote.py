@@ -0,0 +1,34 @@
+# test_lote.py – lote sobrevive à morte de um processo do pool
+# =============================================================
+import os
+
+import lote
+import processos
+
+NASCIMENTO = {"nome": "Ana", "data": "10/08/1990", "hora": "14:30",
+              "cidade": "São Paulo", "estado": "SP"}
+
+
+def _calcular_ou_morrer(indice, ident, args, com_pdf):
+    """Roda no pool: a linha com id "morre" derruba o processo (como um OOM)."""
+    if ident == "morre":
+        os._exit(1)
+    return lote._calcular(indice, ident, args, com_pdf)
+
+
+def test_processo_morto_vira_erro_e_o_pool_volta(monkeypatch):
+    calcular = lote._calcular
+    monkeypatch.setattr(lote, "_calcular", _calcular_ou_morrer)
+    entradas = [dict(NASCIMENTO, id=i) for i in range(3)] + [dict(NASCIMENTO, id="morre")] \
+             + [dict(NASCIMENTO, id=i) for i in range(3, 6)]
+
+    resultados = list(lote.gerar_mapas_lote(entradas, max_em_voo=2))
+    assert sorted(r["indice"] for r in resultados) == list(range(len(entradas)))
+    morto = next(r for r in resultados if r["id"] == "morre")
+    assert not morto["sucesso"]
+
+    # O pool quebrado é trocado: o lote seguinte sai inteiro
+    monkeypatch.setattr(lote, "_calcular", calcular)
+    depois = list(lote.gerar_mapas_lote([dict(NASCIMENTO, id=i) for i in range(4)]))
+    assert len(depois) == 4 and all(r["sucesso"] for r in depois)
+    assert not getattr(processos.pool(), "_broken", False)
@@ -0,0 +1,33 @@
+# test_roda.py – roda do mapa com vários PDFs sendo gerados em threads
+# =============================================================
+# O gunicorn roda com threads: dois PDFs ao mesmo tempo não podem dividir
+# objetos do ReportLab (o render marca cada Group durante o desenho).
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from reportlab import rl_config
+
+from astrologia import gerar_mapa_astral
+
+
+@pytest.fixture
+def pdf_invariante(monkeypatch):
+    monkeypatch.setattr(rl_config, "invariant", 1)   # sem data/id: bytes comparáveis
+    import pdf
+    return pdf
+
+
+def test_pdf_em_threads(pdf_invariante):
+    mapa = gerar_mapa_astral("Ana", "10/08/1990", "14:30", "São Paulo", "SP")
+    assert mapa is not None
+    referencia = pdf_invariante.criar_pdf_bytes(mapa)
+    with ThreadPoolExecutor(8) as pool:
+        resultados = list(pool.map(lambda _: pdf_invariante.criar_pdf_bytes(mapa), range(24)))
+    assert all(r == referencia for r in resultados)
+
+def test_svg_em_threads():
+    import roda
+    mapa = gerar_mapa_astral("Ana", "10/08/1990", "14:30", "São Paulo", "SP")
+    referencia = roda.svg(mapa)
+    with ThreadPoolExecutor(8) as pool:
+        assert all(s == referencia for s in pool.map(lambda _: roda.svg(mapa), range(24)))
@@ -0,0 +1,83 @@
+# test_transitos.py – gerador de trânsitos x varredura por força bruta
+# =============================================================
+# A referência amostra cada corpo com swe.calc_ut numa grade fina e acha
+# as trocas de sinal da separação (trânsito − natal) em torno de cada
+# ângulo, em graus inteiros: nenhum alvo em ponto flutuante, nada de
+# duplicata. Cada evento do gerador tem de cair num desses cercos, um
+# para um, e ser exato de fato.
+from collections import Counter
+from datetime import datetime
+
+import numpy as np
+import pytest
+import swisseph as swe
+from flatlib import const
+from flatlib.ephem.swe import SWE_OBJECTS
+
+import transitos
+from astrologia import (gerar_mapa_astral, CORPOS_PARA_CALCULO, PONTOS_PARA_ASPECTOS,
+                        ANGULOS)
+
+INICIO, FIM = datetime(2026, 1, 1), datetime(2027, 1, 1)
+PASSO = {const.MOON: 0.05}
+PASSO_PADRAO = 0.1
+TOLERANCIA_DIAS = 1e-3
+
+MAPAS = [
+    ("Ana", "10/08/1990", "14:30", "São Paulo", "SP"),
+    ("Bia", "01/02/1975", "03:10", "Recife", "PE"),
+    ("Caio", "22/11/2001", "18:45", "Manaus", "AM"),
+    ("Davi", "05/05/1960", "09:00", "Porto Alegre", "RS"),
+]
+
+
+def _forca_bruta(natal, t0, t1):
+    """Cercos (corpo, ponto, ângulo, jd_a, jd_b) de cada cruzamento exato."""
+    cercos = []
+    for pid in CORPOS_PARA_CALCULO:
+        passo = PASSO.get(pid, PASSO_PADRAO)
+        jds = np.arange(t0, t1 + passo, passo)
+        lons = np.array([swe.calc_ut(float(jd), SWE_OBJECTS[pid])[0][0] for jd in jds])
+        for ponto, lon_natal in natal.items():
+            sep = np.remainder(lons - lon_natal, 360.0)
+            for angulo in ANGULOS:
+                if pid in (const.NORTH_NODE, const.SOUTH_NODE) and angulo != 0:
+                    continue
+                for alvo in {angulo, (360 - angulo) % 360}:
+                    d = np.remainder(sep - alvo + 180.0, 360.0) - 180.0
+                    k = np.flatnonzero((np.sign(d[:-1]) != np.sign(d[1:]))
+                                       & (np.abs(d[:-1] - d[1:]) < 180.0))
+                    cercos += [(pid, ponto, angulo, jds[i], jds[i + 1]) for i in k
+                               if t0 <= jds[i + 1] and jds[i] < t1]
+    return cercos
+
+
+@pytest.mark.parametrize("nascimento", MAPAS, ids=[m[0] for m in MAPAS])
+def test_igual_a_forca_bruta(nascimento):
+    mapa = gerar_mapa_astral(*nascimento)
+    assert mapa is not None
+    natal = {pid: mapa["objetos"][pid]["grau_completo"] for pid in PONTOS_PARA_ASPECTOS}
+    eventos = list(transitos.transitos(mapa, INICIO, FIM))
+
+    chaves = Counter((e["transito_id"], e["natal_id"], e["angulo"], round(e["jd"], 6))
+                     for e in eventos)
+    assert max(chaves.values()) == 1, "evento duplicado"
+    assert [e["jd"] for e in eventos] == sorted(e["jd"] for e in eventos)
+
+    livres = {}
+    for e in eventos:
+        livres.setdefault((e["transito_id"], e["natal_id"], e["angulo"]), []).append(e["jd"])
+    cercos = _forca_bruta(natal, transitos._jd(INICIO), transitos._jd(FIM))
+    for pid, ponto, angulo, a, b in cercos:
+        candidatos = livres.get((pid, ponto, angulo), [])
+        dentro = [jd for jd in candidatos if a - TOLERANCIA_DIAS <= jd <= b + TOLERANCIA_DIAS]
+        assert dentro, f"{pid} {angulo}° {ponto} entre {a:.3f} e {b:.3f} faltou"
+        candidatos.remove(dentro[0])
+    assert not any(livres.values()), "eventos sem cerco na força bruta"
+
+    for e in eventos:
+        lon = swe.calc_ut(e["jd"], SWE_OBJECTS[e["transito_id"]])[0][0]
+        sep = (lon - natal[e["natal_id"]]) % 360.0
+        erro = min(abs((sep - alvo + 180.0) % 360.0 - 180.0)
+                   for alvo in (e["angulo"], 360 - e["angulo"]))
+        assert erro < 1e-4, e
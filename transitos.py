@@ -0,0 +1,190 @@
+# transitos.py – linha do tempo de trânsitos sobre o mapa natal
+# =============================================================
+# Para cada corpo em trânsito, as posições são amostradas em lote (array
+# de instantes de uma vez, pela tabela de efemérides ou, fora dela, pelo
+# swisseph). As estações (velocidade = 0) entram na grade de amostras,
+# então entre duas amostras o corpo anda sempre no mesmo sentido e cada
+# ponto-alvo (natal ± ângulo do aspecto) é cruzado no máximo uma vez:
+# uma troca de sinal cerca o instante exato, refinado por Newton com
+# salvaguarda de bissecção, todos os cercos de uma vez. Um trânsito que
+# volta ao mesmo ponto-alvo por causa da retrogradação vira 2 ou 3
+# passagens; cruzar o ponto de novo no mesmo sentido já é outro ciclo.
+# Os eventos saem por janela de JANELA_DIAS, em ordem cronológica.
+import math
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import swisseph as swe
+
+import efemerides_tabela
+from metricas import etapa
+from astrologia import (CORPOS_PARA_CALCULO, PONTOS_PARA_ASPECTOS, ANGULOS,
+                        ANGULO_PARA_NOME_EN, TIPO_ASPECTO_PT, ID_PARA_PT)
+from flatlib import const
+from flatlib.ephem.swe import SWE_OBJECTS
+
+# ─── 1. CONFIGURAÇÃO ────────────────────────────────────────────
+JANELA_DIAS = 32
+
+# Passo de amostragem (dias). Precisa ser menor que o intervalo entre duas
+# estações do corpo; a Lua é amostrada mais fino só para o cerco ficar justo.
+PASSO = {
+    const.MOON: 0.5, const.SUN: 1.0, const.MERCURY: 1.0, const.VENUS: 1.0,
+    const.MARS: 2.0,
+}
+PASSO_PADRAO = 4.0
+
+# Corpos lentos: os trânsitos que marcam o ano (usados no capítulo do PDF)
+CORPOS_LENTOS = [const.JUPITER, const.SATURN, const.URANUS, const.NEPTUNE,
+                 const.PLUTO, const.CHIRON]
+
+# Corpos cujo movimento normal é retrógrado (o nodo médio)
+_RETROGRADOS = (const.NORTH_NODE, const.SOUTH_NODE)
+
+_ITERACOES_NEWTON = 12
+_PRECISAO = 1e-7   # graus (~0,0004") – cercos já resolvidos não se mexem mais
+_ITERACOES_ESTACAO = 40
+
+
+# ─── 2. POSIÇÕES EM LOTE ────────────────────────────────────────
+def _posicoes(pid, jds):
+    """Longitudes e velocidades de `pid` nos instantes `jds` (array)."""
+    tabela = efemerides_tabela.carregar()
+    if tabela is not None and efemerides_tabela.cobre(tabela, jds):
+        return efemerides_tabela.posicao(tabela, pid, jds)
+    codigo = SWE_OBJECTS[pid]
+    lon = np.empty_like(jds)
+    vel = np.empty_like(jds)
+    for idx, jd in np.ndenumerate(jds):
+        pos, _ = swe.calc_ut(float(jd), codigo)
+        lon[idx], vel[idx] = pos[0], pos[3]
+    return lon, vel
+
+def _diferenca(lon, alvo):
+    """lon − alvo em (−180, 180]."""
+    return 180.0 - np.remainder(180.0 - (lon - alvo), 360.0)
+
+
+# ─── 3. ESTAÇÕES E CERCOS ───────────────────────────────────────
+def _estacoes(pid, jds, vel):
+    """Instantes em que a velocidade troca de sinal entre amostras (bissecção em lote)."""
+    k = np.flatnonzero(np.sign(vel[:-1]) * np.sign(vel[1:]) < 0)
+    if not len(k):
+        return np.empty(0)
+    a, b, va = jds[k].copy(), jds[k + 1].copy(), vel[k].copy()
+    for _ in range(_ITERACOES_ESTACAO):
+        meio = 0.5 * (a + b)
+        _, vm = _posicoes(pid, meio)
+        mesmo = np.sign(vm) == np.sign(va)
+        a = np.where(mesmo, meio, a)
+        va = np.where(mesmo, vm, va)
+        b = np.where(mesmo, b, meio)
+    return 0.5 * (a + b)
+
+def _refinar(pid, a, b, alvos, da, db):
+    """Newton em todos os cercos [a, b] de uma vez; cai na bissecção fora do cerco."""
+    t = a - da * (b - a) / (db - da)
+    for _ in range(_ITERACOES_NEWTON):
+        lon, vel = _posicoes(pid, t)
+        d = _diferenca(lon, alvos)
+        mesmo = np.sign(d) == np.sign(da)
+        a, da = np.where(mesmo, t, a), np.where(mesmo, d, da)
+        b = np.where(mesmo, b, t)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            novo = t - d / vel
+        fora = ~np.isfinite(novo) | (novo < a) | (novo > b)
+        t = np.where(np.abs(d) < _PRECISAO, t, np.where(fora, 0.5 * (a + b), novo))
+    lon, vel = _posicoes(pid, t)
+    return t, vel
+
+def _alvos(natal, angulos, so_conjuncao):
+    """(longitude alvo, ponto natal, ângulo) para natal ± cada ângulo."""
+    alvos = []
+    for ponto, lon in natal.items():
+        for angulo in angulos:
+            if so_conjuncao and angulo != 0:
+                continue
+            # Conjunção e oposição têm um só alvo (lon ± 180 podem diferir em 1 ulp)
+            lados = (angulo,) if angulo in (0, 180) else (angulo, -angulo)
+            alvos += [(float(np.remainder(lon + lado, 360.0)), ponto, angulo) for lado in lados]
+    return alvos
+
+def _eventos_corpo(pid, natal, angulos, t0, t1):
+    """Eventos (jd, ponto natal, ângulo, alvo, velocidade) do corpo em [t0, t1)."""
+    passo = PASSO.get(pid, PASSO_PADRAO)
+    jds = np.linspace(t0, t1, max(2, math.ceil((t1 - t0) / passo) + 1))
+    lon, vel = _posicoes(pid, jds)
+    estacoes = _estacoes(pid, jds, vel)
+    if len(estacoes):
+        jds = np.sort(np.concatenate([jds, estacoes]))
+        lon, vel = _posicoes(pid, jds)
+
+    alvos = _alvos(natal, angulos, pid in (const.NORTH_NODE, const.SOUTH_NODE))
+    lon_alvo = np.array([a[0] for a in alvos])
+    d = _diferenca(lon[:, None], lon_alvo[None, :])          # (amostras, alvos)
+    cruza = (np.sign(d[:-1]) != np.sign(d[1:])) & (np.abs(d[:-1] - d[1:]) < 180.0)
+    k, j = np.nonzero(cruza)
+    if not len(k):
+        return []
+    t, v = _refinar(pid, jds[k], jds[k + 1], lon_alvo[j], d[k, j], d[k + 1, j])
+    dentro = (t >= t0) & (t < t1)
+    return [(float(t[i]), alvos[j[i]][1], alvos[j[i]][2], float(alvos[j[i]][0]), float(v[i]))
+            for i in np.flatnonzero(dentro)]
+
+
+# ─── 4. API ─────────────────────────────────────────────────────
+def _jd(dt):
+    return swe.julday(dt.year, dt.month, dt.day,
+                      getattr(dt, "hour", 0) + getattr(dt, "minute", 0) / 60.0
+                      + getattr(dt, "second", 0) / 3600.0)
+
+def _data(jd):
+    ano, mes, dia, horas = swe.revjul(jd)
+    return datetime(ano, mes, dia) + timedelta(hours=horas)
+
+def transitos(mapa: dict, inicio, fim, corpos=None, angulos=ANGULOS):
+    """
+    Gerador de trânsitos exatos entre `inicio` e `fim` (datetime/date em
+    UTC) sobre os pontos natais de `mapa` (o dict de gerar_mapa_astral),
+    em ordem cronológica. Cada evento é um dict com `jd`, `data` (datetime
+    UTC), o corpo em trânsito, o ponto natal, o aspecto, `retrogrado` e
+    `passagem` (2, 3 quando a retrogradação faz o corpo voltar ao mesmo
+    ponto-alvo; volta a 1 quando ele cruza o ponto no mesmo sentido da
+    vez anterior, isto é, num novo ciclo).
+    """
+    natal = {pid: mapa["objetos"][pid]["grau_completo"] for pid in PONTOS_PARA_ASPECTOS
+             if pid in mapa["objetos"]}
+    corpos = list(corpos or CORPOS_PARA_CALCULO)
+    passagens = {}   # (corpo, alvo) -> (passagem, sentido) do último cruzamento
+    t_inicio, t_fim = _jd(inicio), _jd(fim)
+    t0 = t_inicio
+    while t0 < t_fim:
+        t1 = min(t0 + JANELA_DIAS, t_fim)
+        janela = []
+        for pid in corpos:
+            janela += [(jd, pid, ponto, angulo, alvo, vel)
+                       for jd, ponto, angulo, alvo, vel in _eventos_corpo(pid, natal, angulos, t0, t1)]
+        for jd, pid, ponto, angulo, alvo, vel in sorted(janela):
+            chave, sentido = (pid, alvo), vel < 0
+            anterior = passagens.get(chave)
+            if anterior is None:
+                # Contra o movimento normal nunca é a 1ª: a 1ª foi antes de `inicio`
+                passagem = 1 if sentido == (pid in _RETROGRADOS) else 2
+            else:
+                passagem = anterior[0] + 1 if sentido != anterior[1] else 1
+            passagens[chave] = (passagem, sentido)
+            tipo_en = ANGULO_PARA_NOME_EN[angulo]
+            yield {
+                "jd": jd, "data": _data(jd),
+                "transito_id": pid, "transito_nome": ID_PARA_PT.get(pid, pid),
+                "natal_id": ponto, "natal_nome": ID_PARA_PT.get(ponto, ponto),
+                "tipo_en": tipo_en, "tipo_pt": TIPO_ASPECTO_PT.get(tipo_en, tipo_en),
+                "angulo": angulo, "retrogrado": sentido,
+                "passagem": passagem,
+            }
+        t0 = t1
+
+def proximos_12_meses(mapa: dict) -> list:
+    """Trânsitos exatos dos planetas lentos nos próximos 12 meses (capítulo do PDF)."""
+    hoje = datetime.now(timezone.utc).replace(tzinfo=None, hour=0, minute=0, second=0, microsecond=0)
+    with etapa("transitos"):
+        return list(transitos(mapa, hoje, hoje + timedelta(days=365), corpos=CORPOS_LENTOS))